@@ -6,18 +6,41 @@ Reads a JSON request from stdin and writes a JSON response to stdout.
 
 from __future__ import annotations
 
+import contextlib
+import functools
+import io
 import json
+import math
 import sys
 import time
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING
 
 import gi
 
 gi.require_version("Atspi", "2.0")
-from gi.repository import Atspi  # noqa: E402
+from gi.repository import Atspi, GLib  # noqa: E402
 
+if TYPE_CHECKING:
+    from collections.abc import Iterator
 
-@dataclass
+# Enum → string tables built once at import. States are translated from a single
+# get_states() call instead of probing every Atspi.StateType member per element,
+# and role names are resolved locally from the (cached) role enum.
+_STATE_NICKS: dict[int, str] = {
+    int(state): state.value_nick for state in Atspi.StateType if state.value_nick
+}
+_ROLE_NAMES: dict[int, str] = {
+    int(role): name for role in Atspi.Role if (name := Atspi.role_get_name(role))
+}
+
+_ROLE_IDS: dict[str, int] = {name: role for role, name in _ROLE_NAMES.items()}
+
+# Indentation strings for the formatted tree, one per depth level.
+_INDENTS: tuple[str, ...] = tuple("  " * depth for depth in range(64))
+
+
+@dataclass(slots=True, frozen=True)
 class ElementInfo:
     """Information about a single UI element."""
 
@@ -34,10 +57,15 @@ class ElementInfo:
     depth: int
 
 
+_ELEMENT_FIELDS: tuple[str, ...] = tuple(f.name for f in fields(ElementInfo))
+
+
 def get_accessibility_tree(
     app_name: str = "",
     max_depth: int = 15,
     role: str = "",
+    include_actions: bool = True,
+    showing_only: bool = False,
 ) -> str:
     """Get the accessibility tree as a formatted text string.
 
@@ -46,64 +74,62 @@ def get_accessibility_tree(
         max_depth: Maximum tree depth to traverse.
         role: Filter to elements with this role (empty = all roles).
             Non-matching elements are hidden but their children are still traversed.
+        include_actions: List each element's actions. Disabling this saves one D-Bus
+            round-trip per action on every actionable element.
+        showing_only: Only list elements in the "showing" state. Off-screen elements
+            are hidden before their name, extents and actions are fetched.
 
     Returns:
         Formatted text representation of the accessibility tree.
     """
-    desktop = Atspi.get_desktop(0)
-    lines: list[str] = []
+    buf = io.StringIO()
     total = 0
     role_filter = role.lower()
 
-    for i in range(desktop.get_child_count()):
-        app = desktop.get_child_at_index(i)
-        if app is None:
-            continue
-
-        name = app.get_name() or ""
-        if app_name and app_name.lower() not in name.lower():
-            continue
-
-        count = _format_element(app, lines, depth=0, max_depth=max_depth, role_filter=role_filter)
+    for app in _iter_applications(app_name):
+        count = _format_element(
+            app,
+            buf,
+            max_depth=max_depth,
+            role_filter=role_filter,
+            include_actions=include_actions,
+            showing_only=showing_only,
+        )
         total += count
 
-    if not lines:
+    if not total:
         return "(no accessible applications found)"
 
-    header = f"# Accessibility Tree ({total} elements)\n\n"
-    return header + "\n".join(lines)
+    # Every formatted line is written with a leading newline, which supplies the
+    # blank line after the header.
+    return f"# Accessibility Tree ({total} elements)\n" + buf.getvalue()
 
 
 def find_elements(
-    query: str, app_name: str = "", states: list[str] | None = None
+    query: str, app_name: str = "", states: list[str] | None = None, role: str = ""
 ) -> list[ElementInfo]:
     """Find elements matching a query string and/or required states.
 
     Searches element names, roles, and descriptions. Optionally filters
-    by AT-SPI2 states.
+    by AT-SPI2 states and role.
 
     Args:
         query: Search string (case-insensitive). Empty string matches all elements.
         app_name: Filter to a specific application.
         states: If provided, only return elements that have ALL of these states.
+        role: If provided, only return elements with exactly this role (case-insensitive).
 
     Returns:
         List of matching ElementInfo objects.
     """
-    desktop = Atspi.get_desktop(0)
     results: list[ElementInfo] = []
     query_lower = query.lower()
+    role_filter = role.lower()
 
-    for i in range(desktop.get_child_count()):
-        app = desktop.get_child_at_index(i)
-        if app is None:
-            continue
-
-        name = app.get_name() or ""
-        if app_name and app_name.lower() not in name.lower():
-            continue
-
-        _search_element(app, query_lower, results, depth=0, max_depth=15, required_states=states)
+    for app in _iter_applications(app_name):
+        _search_element(
+            app, query_lower, results, max_depth=15, required_states=states, role_filter=role_filter
+        )
 
     return results
 
@@ -114,21 +140,14 @@ def list_windows() -> str:
     Returns:
         Formatted list of apps with per-window title and state markers.
     """
-    desktop = Atspi.get_desktop(0)
     lines: list[str] = []
     app_count = 0
-    for i in range(desktop.get_child_count()):
-        app = desktop.get_child_at_index(i)
-        if app is None:
-            continue
+    for app in _iter_applications():
         app_name = app.get_name() or "(unnamed)"
-        child_count = app.get_child_count()
+        windows = _get_children(app)
         app_count += 1
-        lines.append(f"- {app_name} ({child_count} windows)")
-        for j in range(child_count):
-            win = app.get_child_at_index(j)
-            if win is None:
-                continue
+        lines.append(f"- {app_name} ({len(windows)} windows)")
+        for win in windows:
             win_title = win.get_name() or "(untitled)"
             state_set = win.get_state_set()
             markers: list[str] = []
@@ -152,26 +171,59 @@ def focus_window(app_name: str) -> str:
     Returns:
         Result message.
     """
-    desktop = Atspi.get_desktop(0)
-    for i in range(desktop.get_child_count()):
-        app = desktop.get_child_at_index(i)
-        if app is None:
-            continue
+    for app in _iter_applications(app_name):
         name = app.get_name() or ""
-        if app_name.lower() in name.lower():
-            for j in range(app.get_child_count()):
-                win = app.get_child_at_index(j)
-                if win is None:
-                    continue
+        for win in _get_children(app):
+            try:
+                component = win.get_component_iface()
+                if component is not None:
+                    component.grab_focus()
+                    return f"Focused: {name}"
+            except Exception:
+                continue
+        return f"Found '{name}' but could not focus it"
+    return f"No application matching '{app_name}' found"
+
+
+def focus_app_pid(pid: int, timeout_ms: int = 5000) -> str:
+    """Wait for the application with this process ID to show a window, then focus it.
+
+    The desktop is scanned again whenever the tree changes (e.g. a window is
+    created), so focus follows the window's appearance without polling.
+
+    Args:
+        pid: Process ID of the application.
+        timeout_ms: Maximum wait time in milliseconds.
+
+    Returns:
+        Result message.
+    """
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    changes = _TreeChangeMonitor()
+    try:
+        while True:
+            for app in _iter_applications():
                 try:
-                    component = win.get_component_iface()
-                    if component is not None:
-                        component.grab_focus()
-                        return f"Focused: {name}"
-                except Exception:
+                    if app.get_process_id() != pid:
+                        continue
+                except GLib.Error:  # application left the bus
                     continue
-            return f"Found '{name}' but could not focus it"
-    return f"No application matching '{app_name}' found"
+                for win in _get_children(app):
+                    try:
+                        component = win.get_component_iface()
+                        if component is not None:
+                            component.grab_focus()
+                            return f"Focused: {app.get_name() or '(unnamed)'}"
+                    except Exception:
+                        continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return f"Timeout after {timeout_ms}ms: no window of PID {pid} to focus"
+            changes.wait(min(_REWALK_INTERVAL, remaining))
+            changes.take()
+    finally:
+        changes.close()
 
 
 def wait_for_elements(
@@ -187,7 +239,8 @@ def wait_for_elements(
         query: Search string (case-insensitive). Empty string matches all elements.
         app_name: Filter to a specific application.
         timeout_ms: Maximum wait time in milliseconds.
-        poll_interval_ms: Polling interval in milliseconds.
+        poll_interval_ms: Polling interval in milliseconds (time between tree walks).
+            A burst of tree change events never walks the tree more often.
         states: If provided, only match elements that have ALL of these states.
 
     Returns:
@@ -199,130 +252,327 @@ def wait_for_elements(
     deadline = time.monotonic() + timeout_ms / 1000.0
     interval = poll_interval_ms / 1000.0
 
-    while True:
-        elements = find_elements(query, app_name=app_name, states=states)
-        if elements:
-            return elements
-
-        if time.monotonic() >= deadline:
-            criteria = f"query='{query}'"
-            if states:
-                criteria += f", states={states}"
-            msg = f"Timeout after {timeout_ms}ms: no elements matching {criteria}"
-            raise TimeoutError(msg)
+    # Waiting dispatches AT-SPI events instead of sleeping, so libatspi applies
+    # queued cache updates before the next walk. Walks stay one interval apart
+    # however many change events arrive, and apps that emit none are still polled.
+    changes = _TreeChangeMonitor(min_interval=interval)
+    try:
+        while True:
+            changes.take()
+            elements = find_elements(query, app_name=app_name, states=states)
+            if elements:
+                return elements
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                criteria = f"query='{query}'"
+                if states:
+                    criteria += f", states={states}"
+                msg = f"Timeout after {timeout_ms}ms: no elements matching {criteria}"
+                raise TimeoutError(msg)
+
+            changes.wait(min(interval, remaining))
+    finally:
+        changes.close()
+
+
+# Events after which a previous find_elements() miss may have become a hit.
+_TREE_CHANGE_EVENTS = (
+    "object:children-changed",
+    "object:property-change:accessible-name",
+    "object:property-change:accessible-description",
+    "object:state-changed",
+    "window:create",
+)
+
+# Seconds after which focus_app_pid() scans the desktop again even without events.
+_REWALK_INTERVAL = 1.0
+
+
+class _TreeChangeMonitor:
+    """Track AT-SPI events that can change the result of a tree search.
+
+    Waiting dispatches the GLib main context, which also lets libatspi apply
+    queued cache updates before the next walk. A burst of events (e.g. a list
+    being filled) wakes the waiter at most once per min_interval seconds.
+    """
 
-        time.sleep(interval)
+    def __init__(self, min_interval: float = 0.2) -> None:
+        self._changed = False
+        self._min_interval = min_interval
+        self._not_before = 0.0
+        self._listener = Atspi.EventListener.new(self._on_event)
+        self._registered: list[str] = []
+        for event_type in _TREE_CHANGE_EVENTS:
+            with contextlib.suppress(GLib.Error):
+                if self._listener.register(event_type):
+                    self._registered.append(event_type)
+
+    def _on_event(self, _event: Atspi.Event) -> None:
+        self._changed = True
+
+    def take(self) -> bool:
+        """Return whether a change was seen since the last call, and reset the flag.
+
+        Call right before each walk: wait() then holds back change wake-ups until
+        min_interval seconds have passed.
+        """
+        changed, self._changed = self._changed, False
+        self._not_before = time.monotonic() + self._min_interval
+        return changed
+
+    def wait(self, timeout: float) -> None:
+        """Dispatch incoming events for up to timeout seconds (replaces a plain sleep).
+
+        Returns early once a change event has arrived and min_interval has passed
+        since the last take(), so a matching element is found without waiting out
+        the rest of the timeout.
+        """
+        context = GLib.MainContext.default()
+        end = time.monotonic() + timeout
+        while (now := time.monotonic()) < end:
+            if self._changed:
+                if now >= self._not_before:
+                    return
+                _iterate(context, min(end, self._not_before) - now)
+            else:
+                _iterate(context, end - now)
+
+    def close(self) -> None:
+        """Deregister the event listener."""
+        for event_type in self._registered:
+            with contextlib.suppress(GLib.Error):
+                self._listener.deregister(event_type)
+        self._registered.clear()
+
+
+def _iterate(context: GLib.MainContext, timeout: float) -> None:
+    """Run one blocking main context iteration, woken after at most timeout seconds."""
+    expired: list[bool] = []
+
+    def _expire() -> bool:
+        expired.append(True)
+        return False
+
+    source_id = GLib.timeout_add(max(1, math.ceil(timeout * 1000)), _expire)
+    context.iteration(True)
+    if not expired:
+        GLib.source_remove(source_id)
+
+
+def _iter_applications(app_name: str = "") -> Iterator[Atspi.Accessible]:
+    """Yield desktop applications whose name contains app_name (case-insensitive).
+
+    Applications are visited one at a time: libatspi keeps an unlocked per-process
+    cache and connection state, so traversals must not run on several threads.
+    """
+    desktop = Atspi.get_desktop(0)
+    app_filter = app_name.lower()
+    for i in range(desktop.get_child_count()):
+        app = desktop.get_child_at_index(i)
+        if app is None:
+            continue
+        if app_filter and app_filter not in (app.get_name() or "").lower():
+            continue
+        yield app
 
 
 def _format_element(
-    element: Atspi.Accessible,
-    lines: list[str],
-    depth: int,
+    root: Atspi.Accessible,
+    out: io.StringIO,
     max_depth: int,
     role_filter: str = "",
+    include_actions: bool = True,
+    showing_only: bool = False,
 ) -> int:
-    """Recursively format an element and its children. Returns element count.
+    """Format an element and its descendants depth-first. Returns element count.
 
     When role_filter is set, only elements with a matching role are displayed,
-    but children of non-matching elements are still traversed.
+    but children of non-matching elements are still traversed. showing_only
+    likewise hides elements that are not in the "showing" state.
     """
-    if depth > max_depth:
-        return 0
-
-    info = _extract_info(element, depth)
-    role_match = not role_filter or role_filter == info.role.lower()
+    # Per-node helpers and tables bound to locals for the hot loop
+    write = out.write
+    extract_role = _extract_role
+    extract_states = _extract_states
+    extract_geometry = _extract_geometry
+    indents = _INDENTS
+    n_indents = len(indents)
 
     count = 0
-    if role_match:
-        indent = "  " * depth
-        states_str = f" ({', '.join(info.states)})" if info.states else ""
-        pos_str = f" @ ({info.x}, {info.y}, {info.width}x{info.height})"
-        actions_str = f" [actions: {', '.join(info.actions)}]" if info.actions else ""
-
-        line = f'{indent}- [{info.role}] "{info.name}"{states_str}{pos_str}{actions_str}'
-        lines.append(line)
-        count = 1
-
-    # Always traverse children even when the current element is filtered out
-    for i in range(info.children_count):
-        child = element.get_child_at_index(i)
-        if child is not None:
-            count += _format_element(child, lines, depth + 1, max_depth, role_filter)
+    role_id = _ROLE_IDS.get(role_filter)
+    for element, depth in _iter_subtree(root, max_depth):
+        # Hidden elements only cost the role lookup; everything else is fetched for
+        # the lines that are actually written, straight into locals (no ElementInfo).
+        if role_id is not None and element.get_role() != role_id:
+            continue
+        role = extract_role(element)
+        if role_filter and role_id is None and role_filter != role.lower():
+            continue
+        states = extract_states(element)
+        if showing_only and "showing" not in states:
+            continue
+        name = element.get_name() or ""
+        x, y, width, height, actions = extract_geometry(element, states, include_actions)
+
+        indent = indents[depth] if depth < n_indents else "  " * depth
+        states_str = f" ({', '.join(states)})" if states else ""
+        pos_str = f" @ ({x}, {y}, {width}x{height})"
+        actions_str = f" [actions: {', '.join(actions)}]" if actions else ""
+
+        write(f'\n{indent}- [{role}] "{name}"{states_str}{pos_str}{actions_str}')
+        count += 1
 
     return count
 
 
 def _search_element(
-    element: Atspi.Accessible,
+    root: Atspi.Accessible,
     query: str,
     results: list[ElementInfo],
-    depth: int,
     max_depth: int,
     required_states: list[str] | None = None,
+    role_filter: str = "",
 ) -> None:
-    """Recursively search for elements matching the query and/or required states."""
-    if depth > max_depth:
-        return
+    """Search an element and its descendants for the query and/or required states.
+
+    When role_filter is set, elements with another role are rejected on their role
+    id alone, before any of their strings are fetched.
+    """
+    # Per-node helpers and tables bound to locals for the hot loop
+    append = results.append
+    extract_match_fields = _extract_match_fields
+    extract_states = _extract_states
+
+    role_id = _ROLE_IDS.get(role_filter)
+    for element, depth in _iter_subtree(root, max_depth):
+        if role_filter:
+            if role_id is not None:
+                if element.get_role() != role_id:
+                    continue
+            elif _extract_role(element).lower() != role_filter:
+                continue
+
+        # Only the cheap match fields are fetched for every node; states, extents
+        # and actions are fetched for candidates that pass the query test.
+        role, name, description = extract_match_fields(element)
+
+        # Check if element matches query (empty query matches everything).
+        # The fields are joined with NUL so one lower() and one scan cover all three
+        # without letting a match straddle two fields.
+        if query in f"{name}\0{role}\0{description}".lower():
+            states = extract_states(element)
+            # Check if element matches required states
+            if required_states is None or all(s in states for s in required_states):
+                append(_extract_full_info(element, depth, role, name, description, states))
 
-    info = _extract_info(element, depth)
 
-    # Check if element matches query (empty query matches everything)
-    query_match = (
-        query in info.name.lower()
-        or query in info.role.lower()
-        or query in info.description.lower()
+def _iter_subtree(root: Atspi.Accessible, max_depth: int) -> Iterator[tuple[Atspi.Accessible, int]]:
+    """Yield (element, depth) for root and its descendants in document order.
+
+    Uses a single server-side Collection query when the application supports it,
+    otherwise walks the tree depth-first with an explicit stack.
+    """
+    flat = _collect_subtree(root, max_depth)
+    if flat is not None:
+        yield from flat
+        return
+
+    if max_depth < 0:
+        return
+    stack: list[tuple[Atspi.Accessible, int]] = [(root, 0)]
+    while stack:
+        element, depth = stack.pop()
+        yield element, depth
+        # Children of the deepest layer would be dropped, so they are never fetched
+        if depth < max_depth:
+            # Push in reverse so children pop off the stack in document order
+            stack.extend((child, depth + 1) for child in reversed(_get_children(element)))
+
+
+def _collect_subtree(
+    root: Atspi.Accessible, max_depth: int
+) -> list[tuple[Atspi.Accessible, int]] | None:
+    """Flatten a subtree with one Collection.get_matches() call.
+
+    The application walks its own tree and returns every descendant in canonical
+    (document) order; depths are reconstructed from each element's cached parent.
+    Returns None when the application does not implement the Collection interface
+    (e.g. Qt) or the result cannot be ordered, so the caller can walk the tree.
+    """
+    collection = root.get_collection_iface()
+    if collection is None:
+        return None
+    try:
+        matches = collection.get_matches(
+            _match_all_rule(), Atspi.CollectionSortOrder.CANONICAL, 0, True
+        )
+    except Exception:
+        return None
+
+    depths: dict[Atspi.Accessible, int] = {root: 0}
+    flat: list[tuple[Atspi.Accessible, int]] = [(root, 0)]
+    for element in matches:
+        parent_depth = depths.get(element.get_parent())
+        if parent_depth is None:
+            return None
+        depth = parent_depth + 1
+        depths[element] = depth
+        if depth <= max_depth:
+            flat.append((element, depth))
+    return flat
+
+
+@functools.cache
+def _match_all_rule() -> Atspi.MatchRule:
+    """Build (once) a Collection match rule without constraints, matching every element."""
+    match_all = Atspi.CollectionMatchType.ALL
+    return Atspi.MatchRule.new(
+        Atspi.StateSet.new([]), match_all, {}, match_all, [], match_all, [], match_all, False
     )
 
-    # Check if element matches required states
-    states_match = required_states is None or all(s in info.states for s in required_states)
 
-    if query_match and states_match:
-        results.append(info)
+def _get_children(element: Atspi.Accessible) -> list[Atspi.Accessible]:
+    """Return the direct children of an element, skipping unavailable ones.
 
-    # Search children
-    for i in range(info.children_count):
-        child = element.get_child_at_index(i)
-        if child is not None:
-            _search_element(child, query, results, depth + 1, max_depth, required_states)
+    libatspi has no bulk children accessor; get_child_at_index() is answered from
+    its client-side cache when the application provides one, so the count is read
+    once and the children are collected in a single pass.
+    """
+    get_child = element.get_child_at_index
+    return [child for i in range(element.get_child_count()) if (child := get_child(i)) is not None]
 
 
-def _extract_info(element: Atspi.Accessible, depth: int) -> ElementInfo:
-    """Extract information from an AT-SPI accessible element."""
-    role = element.get_role_name() or "unknown"
+def _extract_match_fields(element: Atspi.Accessible) -> tuple[str, str, str]:
+    """Extract only the fields used for query matching: (role, name, description)."""
+    role = _extract_role(element)
     name = element.get_name() or ""
     description = element.get_description() or ""
+    return role, name, description
 
-    # Get states
-    state_set = element.get_state_set()
-    states: list[str] = []
-    for state in Atspi.StateType:
-        if state_set.contains(state):
-            state_name = state.value_nick
-            if state_name:
-                states.append(state_name)
 
-    # Get position and size
-    x, y, width, height = 0, 0, 0, 0
-    try:
-        component = element.get_component_iface()
-        if component is not None:
-            rect = component.get_extents(Atspi.CoordType.SCREEN)
-            x, y, width, height = rect.x, rect.y, rect.width, rect.height
-    except Exception:
-        pass
+def _extract_role(element: Atspi.Accessible) -> str:
+    """Extract the role name (e.g. "push button") of an element."""
+    # Extended (toolkit-specific) roles are not in the table and need a D-Bus lookup
+    return _ROLE_NAMES.get(element.get_role()) or element.get_role_name() or "unknown"
 
-    # Get available actions
-    actions: list[str] = []
-    try:
-        action_iface = element.get_action_iface()
-        if action_iface is not None:
-            for i in range(action_iface.get_n_actions()):
-                action_name = action_iface.get_action_name(i)
-                if action_name:
-                    actions.append(action_name)
-    except Exception:
-        pass
 
+def _extract_states(element: Atspi.Accessible) -> list[str]:
+    """Extract the state nicks (e.g. "focused", "visible") of an element."""
+    nicks = _STATE_NICKS
+    return [nicks[s] for s in element.get_state_set().get_states() if s in nicks]
+
+
+def _extract_full_info(
+    element: Atspi.Accessible,
+    depth: int,
+    role: str,
+    name: str,
+    description: str,
+    states: list[str],
+) -> ElementInfo:
+    """Complete an ElementInfo from already-fetched match fields and states."""
+    x, y, width, height, actions = _extract_geometry(element, states)
     return ElementInfo(
         role=role,
         name=name,
@@ -338,9 +588,53 @@ def _extract_info(element: Atspi.Accessible, depth: int) -> ElementInfo:
     )
 
 
+def _extract_geometry(
+    element: Atspi.Accessible, states: list[str], fetch_actions: bool = True
+) -> tuple[int, int, int, int, list[str]]:
+    """Extract (x, y, width, height, actions) of an element with known states.
+
+    With fetch_actions=False the action list is left empty without querying it.
+    """
+    interfaces = element.get_interfaces() or []
+
+    # Get position and size. The GetExtents round-trip is skipped for elements
+    # that are neither showing nor visible, whose extents are meaningless.
+    x, y, width, height = 0, 0, 0, 0
+    if "Component" in interfaces and ("showing" in states or "visible" in states):
+        try:
+            rect = element.get_component_iface().get_extents(Atspi.CoordType.SCREEN)
+            x, y, width, height = rect.x, rect.y, rect.width, rect.height
+        except Exception:
+            pass
+
+    # Get available actions
+    actions: list[str] = []
+    if fetch_actions and "Action" in interfaces:
+        try:
+            action_iface = element.get_action_iface()
+            for i in range(action_iface.get_n_actions()):
+                action_name = action_iface.get_action_name(i)
+                if action_name:
+                    actions.append(action_name)
+        except Exception:
+            pass
+
+    return x, y, width, height, actions
+
+
 # ── CLI entrypoint for subprocess execution ──────────────────────────────
 
 
+def _elements_to_dicts(elements: list[ElementInfo]) -> list[dict]:
+    """Convert elements to JSON-ready dicts.
+
+    Unlike dataclasses.asdict(), this does not deep-copy the states/actions lists;
+    the dicts are serialized immediately, so sharing them is safe.
+    """
+    names = _ELEMENT_FIELDS
+    return [{n: getattr(e, n) for n in names} for e in elements]
+
+
 def _handle_request(request: dict) -> dict:
     """Dispatch a JSON request to the appropriate function."""
     op = request.get("op", "")
@@ -350,6 +644,8 @@ def _handle_request(request: dict) -> dict:
             app_name=request.get("app_name", ""),
             max_depth=request.get("max_depth", 15),
             role=request.get("role", ""),
+            include_actions=request.get("include_actions", True),
+            showing_only=request.get("showing_only", False),
         )
         return {"ok": True, "result": result}
 
@@ -358,8 +654,9 @@ def _handle_request(request: dict) -> dict:
             query=request.get("query", ""),
             app_name=request.get("app_name", ""),
             states=request.get("states"),
+            role=request.get("role", ""),
         )
-        return {"ok": True, "result": [asdict(e) for e in elements]}
+        return {"ok": True, "result": _elements_to_dicts(elements)}
 
     if op == "wait":
         try:
@@ -372,7 +669,7 @@ def _handle_request(request: dict) -> dict:
             )
         except TimeoutError as exc:
             return {"ok": False, "error": str(exc)}
-        return {"ok": True, "result": [asdict(e) for e in elements]}
+        return {"ok": True, "result": _elements_to_dicts(elements)}
 
     if op == "list_windows":
         return {"ok": True, "result": list_windows()}
@@ -381,6 +678,10 @@ def _handle_request(request: dict) -> dict:
         result = focus_window(app_name=request.get("app_name", ""))
         return {"ok": True, "result": result}
 
+    if op == "focus_pid":
+        result = focus_app_pid(pid=request["pid"], timeout_ms=request.get("timeout_ms", 5000))
+        return {"ok": True, "result": result}
+
     return {"ok": False, "error": f"Unknown operation: {op}"}
 
 
@@ -6,16 +6,25 @@ Can be used directly from the CLI or wrapped by the MCP server.
 
 from __future__ import annotations
 
+import contextlib
+import io
 import json
 import os
 import shlex
-import shutil
 import subprocess
 import sys
 import time
+from typing import Any
 
-from kwin_mcp.input import InputBackend, MouseButton
-from kwin_mcp.screenshot import capture_frame_burst, capture_screenshot_to_file
+import dbus
+
+from kwin_mcp.input import InputBackend, MouseButton, find_executable
+from kwin_mcp.screenshot import (
+    capture_frame_burst,
+    capture_screenshot_to_file,
+    prewarm_screenshot_connection,
+    release_screenshot_connection,
+)
 from kwin_mcp.session import Session, SessionConfig
 
 # Install hints for external binaries
@@ -45,6 +54,84 @@ _INSTALL_HINTS: dict[str, str] = {
     ),
 }
 
+# Pauses (seconds) between attempts to reach KWin's EIS interface after startup.
+# KWin registers it shortly after its Wayland socket appears; the first attempt is
+# made right away and the total wait is bounded at about 1.5s.
+_EIS_RETRY_DELAYS: tuple[float, ...] = (0.05, 0.1, 0.2, 0.4, 0.8)
+
+# Tool "button" argument -> MouseButton, resolved with one dict lookup per call
+_MOUSE_BUTTONS: dict[str, MouseButton] = {b.value: b for b in MouseButton}
+
+
+def _mouse_button(button: str) -> MouseButton:
+    """Resolve a button name ("left", "right", "middle") to a MouseButton."""
+    btn = _MOUSE_BUTTONS.get(button)
+    if btn is None:
+        msg = f"Unknown mouse button {button!r}; expected one of: {', '.join(_MOUSE_BUTTONS)}"
+        raise ValueError(msg)
+    return btn
+
+
+def _format_found_elements(elements: list[dict[str, Any]], search_desc: str) -> str:
+    """Format find/wait results as a header plus one line per element.
+
+    Lines are written straight into one buffer instead of collected in a list and
+    joined, so large result sets are not held twice.
+    """
+    buf = io.StringIO()
+    write = buf.write
+    write(f"Found {len(elements)} elements matching {search_desc}:\n")
+    for el in elements:
+        write(f'\n- [{el["role"]}] "{el["name"]}" ')
+        write(f"@ ({el['x']}, {el['y']}, {el['width']}x{el['height']})")
+        if el["actions"]:
+            write(f" [actions: {', '.join(el['actions'])}]")
+    return buf.getvalue()
+
+
+def _connect_input(dbus_address: str) -> InputBackend | None:
+    """Connect the EIS input backend, retrying while KWin's EIS interface comes up.
+
+    Returns None if KWin never exposes the interface or the EIS handshake fails.
+    """
+    for delay in (*_EIS_RETRY_DELAYS, None):
+        try:
+            return InputBackend(dbus_address)
+        except dbus.DBusException:
+            # Interface not registered yet
+            if delay is None:
+                return None
+            time.sleep(delay)
+        except RuntimeError:
+            return None
+    return None
+
+
+# Upper bound for launch_app's focus wait, kept below _run_atspi's 30 s subprocess timeout
+_MAX_FOCUS_TIMEOUT_MS = 25_000
+
+
+# Input tools that batch_actions may run; each step calls the method of the same name
+_BATCH_ACTIONS: frozenset[str] = frozenset(
+    {
+        "mouse_click",
+        "mouse_move",
+        "mouse_scroll",
+        "mouse_drag",
+        "mouse_button_down",
+        "mouse_button_up",
+        "keyboard_type",
+        "keyboard_type_unicode",
+        "keyboard_key",
+        "keyboard_key_down",
+        "keyboard_key_up",
+        "touch_tap",
+        "touch_swipe",
+        "touch_pinch",
+        "touch_multi_swipe",
+    }
+)
+
 
 class AutomationEngine:
     """Core automation engine encapsulating all tool logic.
@@ -58,6 +145,8 @@ class AutomationEngine:
         self._input: InputBackend | None = None
         self._clipboard_enabled: bool = False
         self._wl_copy_proc: subprocess.Popen[bytes] | None = None
+        # _session_env() result and the session it was built for
+        self._env_cache: tuple[Session, dict[str, str]] | None = None
 
     # ── Private helpers ───────────────────────────────────────────────────
 
@@ -74,8 +163,15 @@ class AutomationEngine:
         return self._input
 
     def _session_env(self) -> dict[str, str]:
-        """Build environment dict for tools that need the isolated session."""
+        """Return the environment dict for tools that need the isolated session.
+
+        Built once per session and shared by every caller, so it must not be mutated.
+        """
         session = self._get_session()
+        cached = self._env_cache
+        if cached is not None and cached[0] is session and session.info is not None:
+            return cached[1]
+
         env = {**os.environ}
         info = session.info
         if info:
@@ -91,6 +187,8 @@ class AutomationEngine:
                 env["XDG_STATE_HOME"] = str(info.home_dir / ".local" / "state")
         env["QT_QPA_PLATFORM"] = "wayland"
         env.pop("DISPLAY", None)
+        if info:
+            self._env_cache = (session, env)
         return env
 
     def _run_atspi(self, op: str, **kwargs: object) -> dict:
@@ -149,14 +247,17 @@ class AutomationEngine:
         if info is None:
             return action_result
 
+        # Sorted once here; sorting the already-ordered list again in
+        # capture_frame_burst is a single linear pass.
+        delays_ms = sorted(screenshot_after_ms)
         frames = capture_frame_burst(
             dbus_address=info.dbus_address,
             output_dir=info.screenshot_dir,
-            delays_ms=screenshot_after_ms,
+            delays_ms=delays_ms,
         )
 
         lines = [action_result, f"Captured {len(frames)} frames:"]
-        for delay_ms, path in zip(sorted(screenshot_after_ms), frames, strict=True):
+        for delay_ms, path in zip(delays_ms, frames, strict=True):
             size_kb = path.stat().st_size / 1024
             lines.append(f"  {delay_ms}ms: {path} ({size_kb:.1f} KB)")
         return "\n".join(lines)
@@ -202,11 +303,11 @@ class AutomationEngine:
             result += f"\nApp log: {app_info.log_path}"
 
         # Set up input backend via KWin's EIS D-Bus interface
-        time.sleep(0.5)
-        try:
-            self._input = InputBackend(info.dbus_address)
-        except RuntimeError:
-            self._input = None
+        self._input = _connect_input(info.dbus_address)
+
+        # Connect for screenshots now so the first capture does not pay for the handshake
+        if info.dbus_address:
+            prewarm_screenshot_connection(info.dbus_address)
 
         input_status = "Input backend: KWin EIS" if self._input else "No input backend available"
         result += f"\n{input_status}"
@@ -230,9 +331,12 @@ class AutomationEngine:
 
         if self._input is not None:
             self._input.close()
+        if self._session.info is not None:
+            release_screenshot_connection(self._session.info.dbus_address)
         self._session.stop()
         self._session = None
         self._input = None
+        self._env_cache = None
         return "Session stopped."
 
     # ── Screenshot / Accessibility ────────────────────────────────────────
@@ -254,24 +358,40 @@ class AutomationEngine:
         size_kb = path.stat().st_size / 1024
         return f"Screenshot saved: {path} ({size_kb:.1f} KB)"
 
-    def accessibility_tree(self, app_name: str = "", max_depth: int = 15, role: str = "") -> str:
+    def accessibility_tree(
+        self,
+        app_name: str = "",
+        max_depth: int = 15,
+        role: str = "",
+        include_actions: bool = True,
+        showing_only: bool = False,
+    ) -> str:
         """Get the accessibility tree of apps in the isolated session."""
         self._get_session()
-        resp = self._run_atspi("tree", app_name=app_name, max_depth=max_depth, role=role)
+        resp = self._run_atspi(
+            "tree",
+            app_name=app_name,
+            max_depth=max_depth,
+            role=role,
+            include_actions=include_actions,
+            showing_only=showing_only,
+        )
         return resp["result"]
 
     def find_ui_elements(
-        self, query: str, app_name: str = "", states: list[str] | None = None
+        self, query: str, app_name: str = "", states: list[str] | None = None, role: str = ""
     ) -> str:
-        """Find UI elements matching a search query and/or required states."""
+        """Find UI elements matching a search query, role and/or required states."""
         self._get_session()
-        resp = self._run_atspi("find", query=query, app_name=app_name, states=states)
+        resp = self._run_atspi("find", query=query, app_name=app_name, states=states, role=role)
         elements = resp["result"]
 
         # Build descriptive search summary
         criteria: list[str] = []
         if query:
             criteria.append(f"query='{query}'")
+        if role:
+            criteria.append(f"role='{role}'")
         if states:
             criteria.append(f"states={states}")
         search_desc = ", ".join(criteria) if criteria else "(all)"
@@ -279,14 +399,7 @@ class AutomationEngine:
         if not elements:
             return f"No elements found matching {search_desc}"
 
-        lines = [f"Found {len(elements)} elements matching {search_desc}:\n"]
-        for el in elements:
-            actions_str = f" [actions: {', '.join(el['actions'])}]" if el["actions"] else ""
-            lines.append(
-                f'- [{el["role"]}] "{el["name"]}" '
-                f"@ ({el['x']}, {el['y']}, {el['width']}x{el['height']}){actions_str}"
-            )
-        return "\n".join(lines)
+        return _format_found_elements(elements, search_desc)
 
     # ── Mouse tools ───────────────────────────────────────────────────────
 
@@ -303,7 +416,7 @@ class AutomationEngine:
     ) -> str:
         """Click at coordinates in the isolated session."""
         inp = self._get_input()
-        btn = MouseButton(button)
+        btn = _mouse_button(button)
         click_count = 3 if triple else (2 if double else 1)
         inp.mouse_click(x, y, btn, click_count=click_count, modifiers=modifiers, hold_ms=hold_ms)
 
@@ -363,7 +476,7 @@ class AutomationEngine:
     ) -> str:
         """Drag from one point to another in the isolated session."""
         inp = self._get_input()
-        btn = MouseButton(button)
+        btn = _mouse_button(button)
         wp: list[tuple[int, int, int]] | None = None
         if waypoints:
             wp = [(w[0], w[1], w[2]) for w in waypoints]
@@ -384,7 +497,7 @@ class AutomationEngine:
     ) -> str:
         """Press a mouse button at coordinates without releasing."""
         inp = self._get_input()
-        inp.mouse_button_down(x, y, MouseButton(button))
+        inp.mouse_button_down(x, y, _mouse_button(button))
         return f"Button {button} pressed at ({x}, {y})"
 
     def mouse_button_up(
@@ -395,7 +508,7 @@ class AutomationEngine:
     ) -> str:
         """Release a mouse button at coordinates."""
         inp = self._get_input()
-        inp.mouse_button_up(x, y, MouseButton(button))
+        inp.mouse_button_up(x, y, _mouse_button(button))
         return f"Button {button} released at ({x}, {y})"
 
     # ── Keyboard tools ────────────────────────────────────────────────────
@@ -417,7 +530,7 @@ class AutomationEngine:
         screenshot_after_ms: list[int] | None = None,
     ) -> str:
         """Type arbitrary Unicode text including non-ASCII characters."""
-        if not shutil.which("wtype") and not shutil.which("wl-copy"):
+        if not find_executable("wtype") and not find_executable("wl-copy"):
             return (
                 "Neither wtype nor wl-copy found. Install at least one: "
                 "wtype (e.g. 'sudo pacman -S wtype') or "
@@ -520,6 +633,48 @@ class AutomationEngine:
         )
         return self._with_frame_capture(desc, screenshot_after_ms)
 
+    # ── Batched actions ───────────────────────────────────────────────────
+
+    def batch_actions(
+        self,
+        actions: list[dict[str, Any]],
+        screenshot_after_ms: list[int] | None = None,
+    ) -> str:
+        """Run a sequence of input actions in one call.
+
+        Each action is a dict with an "action" key naming an input tool (e.g.
+        "mouse_click", "keyboard_type") or "dbus_call" plus that tool's parameters,
+        or {"action": "sleep", "ms": N} to pause. Stops at the first failing step.
+        """
+        self._get_session()  # Fail fast; input steps report a missing backend themselves
+
+        lines: list[str] = []
+        done = 0
+        for i, step in enumerate(actions, 1):
+            params = dict(step)
+            name = str(params.pop("action", ""))
+            try:
+                if name == "sleep":
+                    ms = float(params.get("ms", 0))
+                    time.sleep(max(0.0, ms) / 1000.0)
+                    result = f"Slept {ms:g}ms"
+                elif name == "dbus_call":
+                    # A failed call raises here, so it stops the batch like any other step
+                    result = self._dbus_send(**params).strip()
+                elif name in _BATCH_ACTIONS:
+                    result = getattr(self, name)(**params)
+                else:
+                    lines.append(f"{i}. Unknown action {name!r}; stopped")
+                    break
+            except Exception as e:  # Steps bypass the tools' schema validation
+                lines.append(f"{i}. {name} failed: {type(e).__name__}: {e}; stopped")
+                break
+            lines.append(f"{i}. {result}")
+            done += 1
+
+        summary = f"Completed {done}/{len(actions)} actions:\n" + "\n".join(lines)
+        return self._with_frame_capture(summary, screenshot_after_ms)
+
     # ── Clipboard tools ───────────────────────────────────────────────────
 
     def clipboard_get(self) -> str:
@@ -527,16 +682,16 @@ class AutomationEngine:
         if not self._clipboard_enabled:
             return "Clipboard not enabled. Pass enable_clipboard=True to session_start."
 
-        env = self._session_env()
-        try:
-            result = subprocess.run(
-                ["wl-paste", "--no-newline"],
-                env=env,
-                capture_output=True,
-                timeout=5,
-            )
-        except FileNotFoundError:
+        wl_paste = find_executable("wl-paste")
+        if wl_paste is None:
             return _INSTALL_HINTS["wl-paste"]
+        env = self._session_env()
+        result = subprocess.run(
+            [wl_paste, "--no-newline"],
+            env=env,
+            capture_output=True,
+            timeout=5,
+        )
         if result.returncode != 0:
             return f"Failed to read clipboard: {result.stderr.decode(errors='replace')}"
         return result.stdout.decode(errors="replace")
@@ -555,18 +710,22 @@ class AutomationEngine:
                 self._wl_copy_proc.kill()
             self._wl_copy_proc = None
 
-        env = self._session_env()
-        try:
-            self._wl_copy_proc = subprocess.Popen(
-                ["wl-copy", "--", text],
-                env=env,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-        except FileNotFoundError:
+        wl_copy = find_executable("wl-copy")
+        if wl_copy is None:
             return _INSTALL_HINTS["wl-copy"]
-        time.sleep(0.1)  # Wait for fork to complete
+        env = self._session_env()
+        self._wl_copy_proc = subprocess.Popen(
+            [wl_copy, "--", text],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        # wl-copy takes the selection and then forks its serving child, so return as
+        # soon as the parent exits. Keep the old 100ms cap for a wl-copy that hangs
+        # (it stays tracked and is terminated on the next set or session_stop).
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            self._wl_copy_proc.wait(timeout=0.1)
         return f"Clipboard set: {text!r}"
 
     # ── Wait-for-UI tools ─────────────────────────────────────────────────
@@ -602,23 +761,27 @@ class AutomationEngine:
             criteria.append(f"states={expected_states}")
         search_desc = ", ".join(criteria) if criteria else "(all)"
 
-        lines = [f"Found {len(elements)} elements matching {search_desc}:\n"]
-        for el in elements:
-            actions_str = f" [actions: {', '.join(el['actions'])}]" if el["actions"] else ""
-            lines.append(
-                f'- [{el["role"]}] "{el["name"]}" '
-                f"@ ({el['x']}, {el['y']}, {el['width']}x{el['height']}){actions_str}"
-            )
-        return "\n".join(lines)
+        return _format_found_elements(elements, search_desc)
 
     # ── Window management tools ───────────────────────────────────────────
 
-    def launch_app(self, command: str, env: dict[str, str] | None = None) -> str:
-        """Launch an application inside the running isolated session."""
+    def launch_app(
+        self, command: str, env: dict[str, str] | None = None, focus_timeout_ms: int = 0
+    ) -> str:
+        """Launch an application inside the running isolated session.
+
+        With focus_timeout_ms > 0, also wait (at most 25 s) for the app's first window
+        and focus it.
+        """
         session = self._get_session()
         cmd = shlex.split(command)
         app_info = session.launch_app(cmd, extra_env=env)
-        return f"App launched: {command} (PID={app_info.pid})\nApp log: {app_info.log_path}"
+        result = f"App launched: {command} (PID={app_info.pid})\nApp log: {app_info.log_path}"
+        if focus_timeout_ms > 0:
+            timeout_ms = min(focus_timeout_ms, _MAX_FOCUS_TIMEOUT_MS)
+            resp = self._run_atspi("focus_pid", pid=app_info.pid, timeout_ms=timeout_ms)
+            result += f"\n{resp['result']}"
+        return result
 
     def list_windows(self) -> str:
         """List accessible application windows in the isolated session."""
@@ -643,9 +806,26 @@ class AutomationEngine:
         args: list[str] | None = None,
     ) -> str:
         """Call a D-Bus method in the isolated session using dbus-send."""
+        try:
+            return self._dbus_send(service, path, interface, method, args)
+        except RuntimeError as e:
+            return str(e)
+
+    def _dbus_send(
+        self,
+        service: str,
+        path: str,
+        interface: str,
+        method: str,
+        args: list[str] | None = None,
+    ) -> str:
+        """Run dbus-send and return its printed reply; raise RuntimeError on failure."""
+        dbus_send = find_executable("dbus-send")
+        if dbus_send is None:
+            raise RuntimeError(_INSTALL_HINTS["dbus-send"])
         env = self._session_env()
         cmd = [
-            "dbus-send",
+            dbus_send,
             "--session",
             "--print-reply",
             f"--dest={service}",
@@ -655,17 +835,10 @@ class AutomationEngine:
         if args:
             cmd.extend(args)
 
-        try:
-            result = subprocess.run(
-                cmd,
-                env=env,
-                capture_output=True,
-                timeout=10,
-            )
-        except FileNotFoundError:
-            return _INSTALL_HINTS["dbus-send"]
+        result = subprocess.run(cmd, env=env, capture_output=True, timeout=10)
         if result.returncode != 0:
-            return f"D-Bus call failed: {result.stderr.decode(errors='replace')}"
+            msg = f"D-Bus call failed: {result.stderr.decode(errors='replace')}"
+            raise RuntimeError(msg)
         return result.stdout.decode(errors="replace")
 
     def read_app_log(self, pid: int, last_n_lines: int = 50) -> str:
@@ -675,23 +848,19 @@ class AutomationEngine:
 
     def wayland_info(self, filter_protocol: str = "") -> str:
         """List Wayland protocols available in the isolated session."""
-        env = self._session_env()
-        try:
-            result = subprocess.run(
-                ["wayland-info"],
-                env=env,
-                capture_output=True,
-                timeout=10,
-            )
-        except FileNotFoundError:
+        wayland_info = find_executable("wayland-info")
+        if wayland_info is None:
             return _INSTALL_HINTS["wayland-info"]
+        env = self._session_env()
+        result = subprocess.run([wayland_info], env=env, capture_output=True, timeout=10)
         if result.returncode != 0:
             return f"wayland-info failed: {result.stderr.decode(errors='replace')}"
 
-        output = result.stdout.decode(errors="replace")
         if filter_protocol:
-            lines = [line for line in output.splitlines() if filter_protocol in line]
+            # Filter on the raw bytes and decode only the matching lines
+            needle = filter_protocol.encode()
+            lines = [line for line in result.stdout.splitlines() if needle in line]
             if not lines:
                 return f"No protocols matching '{filter_protocol}' found."
-            return "\n".join(lines)
-        return output
+            return b"\n".join(lines).decode(errors="replace")
+        return result.stdout.decode(errors="replace")
@@ -13,28 +13,38 @@ from __future__ import annotations
 import contextlib
 import ctypes
 import ctypes.util
-import select
+import functools
+import math
+import os
+import selectors
 import shutil
 import subprocess
 import time
 from enum import Enum
+from typing import TYPE_CHECKING
 
 import dbus
-from dbus.mainloop.glib import DBusGMainLoop
+import dbus.bus
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
 
 
 class MouseButton(Enum):
-    LEFT = "left"
-    RIGHT = "right"
-    MIDDLE = "middle"
+    """Mouse button, looked up by name; ``code`` is its Linux input event code."""
 
+    code: int
+
+    def __new__(cls, value: str, code: int) -> MouseButton:
+        member = object.__new__(cls)
+        member._value_ = value
+        member.code = code
+        return member
+
+    LEFT = ("left", 0x110)  # BTN_LEFT
+    RIGHT = ("right", 0x111)  # BTN_RIGHT
+    MIDDLE = ("middle", 0x112)  # BTN_MIDDLE
 
-# Linux input event codes for mouse buttons
-_BTN_CODES: dict[MouseButton, int] = {
-    MouseButton.LEFT: 0x110,  # BTN_LEFT
-    MouseButton.RIGHT: 0x111,  # BTN_RIGHT
-    MouseButton.MIDDLE: 0x112,  # BTN_MIDDLE
-}
 
 # Linux evdev keycodes for special keys
 _EVDEV_KEY_MAP: dict[str, int] = {
@@ -108,6 +118,11 @@ _CHAR_KEY_MAP[" "] = (57, False)  # space
 _CHAR_KEY_MAP["\t"] = (15, False)  # tab
 _CHAR_KEY_MAP["\n"] = (28, False)  # enter
 
+# The same mapping as flat tables indexed by code point (all entries are ASCII);
+# a keycode of 0 marks an unmapped character.
+_ASCII_KEYCODES = bytes(_CHAR_KEY_MAP.get(chr(c), (0, False))[0] for c in range(128))
+_ASCII_NEEDS_SHIFT = bytes(_CHAR_KEY_MAP.get(chr(c), (0, False))[1] for c in range(128))
+
 # Button states
 _PRESSED = 1
 _RELEASED = 0
@@ -130,89 +145,72 @@ _EI_EVENT_DEVICE_RESUMED = 8
 # Scroll axis values (in libei, scroll is in pixels)
 _SCROLL_STEP_PIXELS = 15.0
 
+# Pacing between the steps of a split scroll
+_STEP_INTERVAL_NS = 10_000_000
 
-def _load_libei() -> ctypes.CDLL:
-    """Load libei shared library and set up function prototypes."""
-    lib = ctypes.CDLL("libei.so.1")
+# keyboard_type pacing: how long each key is held, and the gap before the next key
+_TYPE_HOLD_NS = 10_000_000
+_TYPE_GAP_NS = 10_000_000
 
-    # Context management
-    lib.ei_new_sender.restype = ctypes.c_void_p
-    lib.ei_new_sender.argtypes = [ctypes.c_void_p]
-    lib.ei_configure_name.restype = None
-    lib.ei_configure_name.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
-    lib.ei_setup_backend_fd.restype = ctypes.c_int
-    lib.ei_setup_backend_fd.argtypes = [ctypes.c_void_p, ctypes.c_int]
-    lib.ei_dispatch.restype = ctypes.c_int
-    lib.ei_dispatch.argtypes = [ctypes.c_void_p]
-    lib.ei_get_event.restype = ctypes.c_void_p
-    lib.ei_get_event.argtypes = [ctypes.c_void_p]
-    lib.ei_event_get_type.restype = ctypes.c_int
-    lib.ei_event_get_type.argtypes = [ctypes.c_void_p]
-    lib.ei_event_unref.restype = ctypes.c_void_p
-    lib.ei_event_unref.argtypes = [ctypes.c_void_p]
-    lib.ei_unref.restype = ctypes.c_void_p
-    lib.ei_unref.argtypes = [ctypes.c_void_p]
-    lib.ei_get_fd.restype = ctypes.c_int
-    lib.ei_get_fd.argtypes = [ctypes.c_void_p]
-
-    # Seat functions
-    lib.ei_event_get_seat.restype = ctypes.c_void_p
-    lib.ei_event_get_seat.argtypes = [ctypes.c_void_p]
-    lib.ei_seat_has_capability.restype = ctypes.c_int
-    lib.ei_seat_has_capability.argtypes = [ctypes.c_void_p, ctypes.c_uint]
-    lib.ei_seat_ref.restype = ctypes.c_void_p
-    lib.ei_seat_ref.argtypes = [ctypes.c_void_p]
-    # ei_seat_bind_capabilities is variadic, argtypes not set
+# Text at least this long (in UTF-8 bytes) is piped to wtype instead of passed as argv
+_WTYPE_ARGV_LIMIT = 64 * 1024
 
-    # Device functions
-    lib.ei_event_get_device.restype = ctypes.c_void_p
-    lib.ei_event_get_device.argtypes = [ctypes.c_void_p]
-    lib.ei_device_get_name.restype = ctypes.c_char_p
-    lib.ei_device_get_name.argtypes = [ctypes.c_void_p]
-    lib.ei_device_has_capability.restype = ctypes.c_int
-    lib.ei_device_has_capability.argtypes = [ctypes.c_void_p, ctypes.c_uint]
-    lib.ei_device_ref.restype = ctypes.c_void_p
-    lib.ei_device_ref.argtypes = [ctypes.c_void_p]
-    lib.ei_device_unref.restype = ctypes.c_void_p
-    lib.ei_device_unref.argtypes = [ctypes.c_void_p]
 
-    # Input injection
-    lib.ei_device_pointer_motion.restype = None
-    lib.ei_device_pointer_motion.argtypes = [ctypes.c_void_p, ctypes.c_double, ctypes.c_double]
-    lib.ei_device_pointer_motion_absolute.restype = None
-    lib.ei_device_pointer_motion_absolute.argtypes = [
-        ctypes.c_void_p,
-        ctypes.c_double,
-        ctypes.c_double,
-    ]
-    lib.ei_device_button_button.restype = None
-    lib.ei_device_button_button.argtypes = [ctypes.c_void_p, ctypes.c_uint32, ctypes.c_int]
-    lib.ei_device_scroll_delta.restype = None
-    lib.ei_device_scroll_delta.argtypes = [ctypes.c_void_p, ctypes.c_double, ctypes.c_double]
-    lib.ei_device_scroll_discrete.restype = None
-    lib.ei_device_scroll_discrete.argtypes = [ctypes.c_void_p, ctypes.c_int32, ctypes.c_int32]
-    lib.ei_device_scroll_stop.restype = None
-    lib.ei_device_scroll_stop.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
-    lib.ei_device_keyboard_key.restype = None
-    lib.ei_device_keyboard_key.argtypes = [ctypes.c_void_p, ctypes.c_uint32, ctypes.c_int]
-    lib.ei_device_frame.restype = None
-    lib.ei_device_frame.argtypes = [ctypes.c_void_p, ctypes.c_uint64]
-    lib.ei_device_start_emulating.restype = None
-    lib.ei_device_start_emulating.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
-    lib.ei_device_stop_emulating.restype = None
-    lib.ei_device_stop_emulating.argtypes = [ctypes.c_void_p]
+_VP = ctypes.c_void_p
+_DBL = ctypes.c_double
 
+# libei prototypes as (name, restype, argtypes), applied in one pass by _load_libei()
+_EI_PROTOTYPES: tuple[tuple[str, type | None, tuple[type, ...]], ...] = (
+    # Context management
+    ("ei_new_sender", _VP, (_VP,)),
+    ("ei_configure_name", None, (_VP, ctypes.c_char_p)),
+    ("ei_setup_backend_fd", ctypes.c_int, (_VP, ctypes.c_int)),
+    ("ei_dispatch", ctypes.c_int, (_VP,)),
+    ("ei_get_event", _VP, (_VP,)),
+    ("ei_event_get_type", ctypes.c_int, (_VP,)),
+    ("ei_event_unref", _VP, (_VP,)),
+    ("ei_unref", _VP, (_VP,)),
+    ("ei_get_fd", ctypes.c_int, (_VP,)),
+    # Seat functions (ei_seat_bind_capabilities is variadic, argtypes not set)
+    ("ei_event_get_seat", _VP, (_VP,)),
+    ("ei_seat_has_capability", ctypes.c_int, (_VP, ctypes.c_uint)),
+    ("ei_seat_ref", _VP, (_VP,)),
+    # Device functions
+    ("ei_event_get_device", _VP, (_VP,)),
+    ("ei_device_get_name", ctypes.c_char_p, (_VP,)),
+    ("ei_device_has_capability", ctypes.c_int, (_VP, ctypes.c_uint)),
+    ("ei_device_ref", _VP, (_VP,)),
+    ("ei_device_unref", _VP, (_VP,)),
+    # Input injection
+    ("ei_device_pointer_motion", None, (_VP, _DBL, _DBL)),
+    ("ei_device_pointer_motion_absolute", None, (_VP, _DBL, _DBL)),
+    ("ei_device_button_button", None, (_VP, ctypes.c_uint32, ctypes.c_int)),
+    ("ei_device_scroll_delta", None, (_VP, _DBL, _DBL)),
+    ("ei_device_scroll_discrete", None, (_VP, ctypes.c_int32, ctypes.c_int32)),
+    ("ei_device_scroll_stop", None, (_VP, ctypes.c_int, ctypes.c_int)),
+    ("ei_device_keyboard_key", None, (_VP, ctypes.c_uint32, ctypes.c_int)),
+    ("ei_device_frame", None, (_VP, ctypes.c_uint64)),
+    ("ei_device_start_emulating", None, (_VP, ctypes.c_uint32)),
+    ("ei_device_stop_emulating", None, (_VP,)),
     # Touch functions
-    lib.ei_device_touch_new.restype = ctypes.c_void_p
-    lib.ei_device_touch_new.argtypes = [ctypes.c_void_p]
-    lib.ei_touch_down.restype = None
-    lib.ei_touch_down.argtypes = [ctypes.c_void_p, ctypes.c_double, ctypes.c_double]
-    lib.ei_touch_motion.restype = None
-    lib.ei_touch_motion.argtypes = [ctypes.c_void_p, ctypes.c_double, ctypes.c_double]
-    lib.ei_touch_up.restype = None
-    lib.ei_touch_up.argtypes = [ctypes.c_void_p]
-    lib.ei_touch_unref.restype = ctypes.c_void_p
-    lib.ei_touch_unref.argtypes = [ctypes.c_void_p]
+    ("ei_device_touch_new", _VP, (_VP,)),
+    ("ei_touch_down", None, (_VP, _DBL, _DBL)),
+    ("ei_touch_motion", None, (_VP, _DBL, _DBL)),
+    ("ei_touch_up", None, (_VP,)),
+    ("ei_touch_unref", _VP, (_VP,)),
+)
+
+
+def _load_libei() -> ctypes.CDLL:
+    """Load libei shared library and set up function prototypes."""
+    # CDLL (unlike PyDLL) releases the GIL for the duration of every foreign call,
+    # so ei_dispatch() and friends never block other Python threads.
+    lib = ctypes.CDLL("libei.so.1")
+
+    for name, restype, argtypes in _EI_PROTOTYPES:
+        func = getattr(lib, name)
+        func.restype = restype
+        func.argtypes = argtypes
 
     return lib
 
@@ -221,6 +219,17 @@ def _load_libei() -> ctypes.CDLL:
 _libei = _load_libei()
 
 
+def _sleep_until(deadline_ns: int) -> None:
+    """Sleep until a time.monotonic_ns() deadline; return at once if it has passed.
+
+    Paced loops sleep towards start + i * interval instead of sleeping a fixed
+    interval per step, so per-step overhead does not accumulate as drift.
+    """
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > 0:
+        time.sleep(remaining / 1e9)
+
+
 class EISClient:
     """Low-level EIS client using KWin's direct D-Bus interface + libei.
 
@@ -230,7 +239,8 @@ class EISClient:
     """
 
     def __init__(self, dbus_address: str) -> None:
-        DBusGMainLoop(set_as_default=True)
+        # Only blocking method calls are made on this connection, so it needs no
+        # main loop integration (signals are never received here).
         self._bus = dbus.bus.BusConnection(dbus_address)
         self._ei: int = 0  # ctypes void pointer (int representation)
         self._cookie: int = 0
@@ -240,7 +250,39 @@ class EISClient:
         self._eis_iface: dbus.Interface | None = None
         self._next_touch_id: int = 0  # auto-increment touch ID
         self._active_touches: dict[int, int] = {}  # touch_id -> ctypes pointer
-        self._setup()
+
+        # The same handles pre-wrapped as c_void_p for the per-event calls, so ctypes
+        # passes them through instead of converting a Python int on every call
+        self._ei_arg = ctypes.c_void_p()
+        self._pointer_arg = ctypes.c_void_p()
+        self._keyboard_arg = ctypes.c_void_p()
+        self._touch_arg = ctypes.c_void_p()  # touch device, or the pointer as fallback
+        # Reused ei_device_frame() timestamp argument (microseconds)
+        self._frame_time = ctypes.c_uint64()
+        self._batch_depth = 0  # > 0 while frames are queued for a single dispatch
+
+        # Hot-path libei functions bound once instead of resolved on every event
+        self._f_frame = _libei.ei_device_frame
+        self._f_dispatch = _libei.ei_dispatch
+        self._f_motion_abs = _libei.ei_device_pointer_motion_absolute
+        self._f_button = _libei.ei_device_button_button
+        self._f_scroll = _libei.ei_device_scroll_delta
+        self._f_scroll_discrete = _libei.ei_device_scroll_discrete
+        self._f_key = _libei.ei_device_keyboard_key
+        self._f_scroll_stop = _libei.ei_device_scroll_stop
+        self._f_touch_new = _libei.ei_device_touch_new
+        self._f_touch_down = _libei.ei_touch_down
+        self._f_touch_motion = _libei.ei_touch_motion
+        self._f_touch_up = _libei.ei_touch_up
+        self._f_touch_unref = _libei.ei_touch_unref
+
+        try:
+            self._setup()
+        except BaseException:
+            # Callers retry while KWin's EIS interface comes up; don't leak a
+            # private bus connection per failed attempt.
+            self._bus.close()
+            raise
 
     def _setup(self) -> None:
         """Connect to KWin EIS and negotiate devices."""
@@ -258,6 +300,8 @@ class EISClient:
         )
         result = self._eis_iface.connectToEIS(dbus.Int32(caps))
         fd = result[0].take()
+        # dbus-python dup()s the fd without O_CLOEXEC; keep it out of spawned children
+        os.set_inheritable(fd, False)
         self._cookie = int(result[1])
 
         # Create libei sender context
@@ -278,43 +322,58 @@ class EISClient:
         # Process handshake events to get devices
         self._negotiate_devices()
 
+        self._ei_arg.value = self._ei
+        self._pointer_arg.value = self._pointer
+        self._keyboard_arg.value = self._keyboard
+        self._touch_arg.value = self._touch_device or self._pointer
+
     def _negotiate_devices(self, timeout: float = 5.0) -> None:
         """Process EIS handshake events until we have pointer + keyboard."""
         ei_fd = _libei.ei_get_fd(self._ei)
-        start = time.monotonic()
-
-        while time.monotonic() - start < timeout:
-            readable, _, _ = select.select([ei_fd], [], [], 0.3)
-            if readable:
+        deadline = time.monotonic() + timeout
+
+        # The fd is registered once; each wait reuses the selector's kernel state
+        with selectors.DefaultSelector() as selector:
+            selector.register(ei_fd, selectors.EVENT_READ)
+            while (remaining := deadline - time.monotonic()) > 0:
+                # ei_dispatch() never blocks: read whatever is already on the socket
+                # and drain the resulting events before deciding to wait.
                 ret = _libei.ei_dispatch(self._ei)
                 if ret < 0:
                     break
 
-            while True:
-                event = _libei.ei_get_event(self._ei)
-                if not event:
-                    break
+                drained = False
+                while True:
+                    event = _libei.ei_get_event(self._ei)
+                    if not event:
+                        break
+                    drained = True
 
-                etype = _libei.ei_event_get_type(event)
+                    etype = _libei.ei_event_get_type(event)
 
-                if etype == _EI_EVENT_DISCONNECT:
-                    _libei.ei_event_unref(event)
-                    msg = "EIS server disconnected during handshake"
-                    raise RuntimeError(msg)
+                    if etype == _EI_EVENT_DISCONNECT:
+                        _libei.ei_event_unref(event)
+                        msg = "EIS server disconnected during handshake"
+                        raise RuntimeError(msg)
 
-                if etype == _EI_EVENT_SEAT_ADDED:
-                    self._bind_seat_capabilities(event)
+                    if etype == _EI_EVENT_SEAT_ADDED:
+                        self._bind_seat_capabilities(event)
 
-                elif etype == _EI_EVENT_DEVICE_ADDED:
-                    self._register_device(event)
+                    elif etype == _EI_EVENT_DEVICE_ADDED:
+                        self._register_device(event)
 
-                elif etype == _EI_EVENT_DEVICE_RESUMED:
-                    pass  # Device ready for input
+                    elif etype == _EI_EVENT_DEVICE_RESUMED:
+                        pass  # Device ready for input
 
-                _libei.ei_event_unref(event)
+                    _libei.ei_event_unref(event)
+
+                if self._pointer and self._keyboard:
+                    break
 
-            if self._pointer and self._keyboard:
-                break
+                # Events usually arrive back to back, so only block (until the server
+                # sends something or the handshake times out) once nothing was queued.
+                if not drained:
+                    selector.select(remaining)
 
         if not self._pointer:
             msg = "No pointer device available from EIS"
@@ -369,60 +428,145 @@ class EISClient:
         if has_touch and not self._touch_device:
             self._touch_device = _libei.ei_device_ref(device)
 
-    def _now_us(self) -> int:
-        """Current time in microseconds."""
-        return int(time.monotonic() * 1_000_000)
+    def _next_frame_time(self) -> ctypes.c_uint64:
+        """Advance the reused frame timestamp (microseconds) and return it.
 
-    def _flush(self) -> None:
-        """Dispatch pending events to send data to KWin."""
-        _libei.ei_dispatch(self._ei)
+        Frames closed within the same microsecond still get strictly increasing
+        timestamps, as EIS expects per device.
+        """
+        frame_time = self._frame_time
+        now = time.monotonic_ns() // 1000
+        frame_time.value = now if now > frame_time.value else frame_time.value + 1
+        return frame_time
+
+    def _commit_frame(self, device: ctypes.c_void_p) -> None:
+        """Close the current frame on a device and send it to KWin.
+
+        Every primitive below queues its event(s) and then ends with this call, so
+        frame + dispatch are issued from one place.
+        """
+        self._f_frame(device, self._next_frame_time())
+        if not self._batch_depth:
+            self._f_dispatch(self._ei_arg)
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """Queue the frames of back-to-back events and dispatch them once on exit.
+
+        Only for events that are meant to arrive together; anything paced by a
+        sleep must be dispatched before sleeping.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._f_dispatch(self._ei_arg)
 
     def pointer_move_absolute(self, x: float, y: float) -> None:
         """Move pointer to absolute coordinates."""
-        _libei.ei_device_pointer_motion_absolute(self._pointer, x, y)
-        _libei.ei_device_frame(self._pointer, self._now_us())
-        self._flush()
+        self._f_motion_abs(self._pointer_arg, x, y)
+        self._commit_frame(self._pointer_arg)
+
+    def pointer_move_path(self, points: list[tuple[float, float]], interval: float) -> None:
+        """Move the pointer through absolute positions, one frame per point.
+
+        Replays a precomputed path in a single tight loop (libei functions held in
+        locals), with points paced interval seconds apart.
+        """
+        motion = self._f_motion_abs
+        frame = self._f_frame
+        dispatch = self._f_dispatch
+        next_time = self._next_frame_time
+        pointer, ei = self._pointer_arg, self._ei_arg
+        interval_ns = int(interval * 1e9)
+        deadline = time.monotonic_ns()
+        for x, y in points:
+            motion(pointer, x, y)
+            frame(pointer, next_time())
+            dispatch(ei)
+            deadline += interval_ns
+            _sleep_until(deadline)
 
     def pointer_button(self, button: int, state: int) -> None:
         """Press/release a mouse button (evdev button code)."""
-        _libei.ei_device_button_button(self._pointer, button, state)
-        _libei.ei_device_frame(self._pointer, self._now_us())
-        self._flush()
+        self._f_button(self._pointer_arg, button, state)
+        self._commit_frame(self._pointer_arg)
+
+    def pointer_button_raw(self, button: int, state: int) -> None:
+        """Queue a button event without closing the frame; see commit_pointer()."""
+        self._f_button(self._pointer_arg, button, state)
+
+    def commit_pointer(self) -> None:
+        """Close the pointer frame holding events queued by the ``_raw`` methods."""
+        self._commit_frame(self._pointer_arg)
 
     def pointer_scroll(self, dx: float, dy: float) -> None:
         """Scroll by pixel delta."""
-        _libei.ei_device_scroll_delta(self._pointer, dx, dy)
-        _libei.ei_device_frame(self._pointer, self._now_us())
-        self._flush()
+        self._f_scroll(self._pointer_arg, dx, dy)
+        self._commit_frame(self._pointer_arg)
 
     def pointer_scroll_discrete(self, dx: int, dy: int) -> None:
         """Scroll by discrete steps (wheel ticks)."""
-        _libei.ei_device_scroll_discrete(self._pointer, dx, dy)
-        _libei.ei_device_frame(self._pointer, self._now_us())
-        self._flush()
+        self._f_scroll_discrete(self._pointer_arg, dx, dy)
+        self._commit_frame(self._pointer_arg)
 
     def pointer_scroll_stop(self) -> None:
         """Signal end of scroll."""
-        _libei.ei_device_scroll_stop(self._pointer, 1, 1)
-        _libei.ei_device_frame(self._pointer, self._now_us())
-        self._flush()
+        self._f_scroll_stop(self._pointer_arg, 1, 1)
+        self._commit_frame(self._pointer_arg)
 
     def keyboard_key(self, keycode: int, state: int) -> None:
         """Press/release a key (evdev keycode)."""
-        _libei.ei_device_keyboard_key(self._keyboard, keycode, state)
-        _libei.ei_device_frame(self._keyboard, self._now_us())
-        self._flush()
+        self._f_key(self._keyboard_arg, keycode, state)
+        self._commit_frame(self._keyboard_arg)
+
+    def keyboard_key_raw(self, keycode: int, state: int) -> None:
+        """Queue a key event without closing the frame; see commit_keyboard()."""
+        self._f_key(self._keyboard_arg, keycode, state)
+
+    def commit_keyboard(self) -> None:
+        """Close the keyboard frame holding events queued by the ``_raw`` methods."""
+        self._commit_frame(self._keyboard_arg)
+
+    def keyboard_replay(self, events: list[tuple[int, int, int]]) -> None:
+        """Send (keycode, state, delay_ns) key events, each followed by its delay.
+
+        An event with a zero delay shares a frame with the events after it; the
+        frame is closed and dispatched at the next non-zero delay (or at the end).
+        Delays are paced against absolute deadlines from the start of the replay.
+        """
+        key = self._f_key
+        frame = self._f_frame
+        dispatch = self._f_dispatch
+        next_time = self._next_frame_time
+        keyboard, ei = self._keyboard_arg, self._ei_arg
+        deadline = time.monotonic_ns()
+        pending = False
+        for keycode, state, delay_ns in events:
+            key(keyboard, keycode, state)
+            if not delay_ns:
+                pending = True
+                continue
+            frame(keyboard, next_time())
+            dispatch(ei)
+            pending = False
+            deadline += delay_ns
+            _sleep_until(deadline)
+        if pending:
+            frame(keyboard, next_time())
+            dispatch(ei)
 
     def touch_down(self, x: float, y: float) -> int:
         """Start a new touch at (x, y). Returns a touch ID."""
-        device = self._touch_device or self._pointer
-        touch = _libei.ei_device_touch_new(device)
+        device = self._touch_arg
+        touch = self._f_touch_new(device)
         if not touch:
             msg = "Failed to create touch object"
             raise RuntimeError(msg)
-        _libei.ei_touch_down(touch, x, y)
-        _libei.ei_device_frame(device, self._now_us())
-        self._flush()
+        self._f_touch_down(touch, x, y)
+        self._commit_frame(device)
 
         touch_id = self._next_touch_id
         self._next_touch_id += 1
@@ -435,10 +579,40 @@ class EISClient:
         if touch is None:
             msg = f"No active touch with ID {touch_id}"
             raise ValueError(msg)
-        device = self._touch_device or self._pointer
-        _libei.ei_touch_motion(touch, x, y)
-        _libei.ei_device_frame(device, self._now_us())
-        self._flush()
+        device = self._touch_arg
+        self._f_touch_motion(touch, x, y)
+        self._commit_frame(device)
+
+    def touch_move_path(
+        self, touch_ids: list[int], path: list[list[tuple[float, float]]], interval_ns: int
+    ) -> None:
+        """Move active touches through precomputed positions, one frame per step.
+
+        Each step of path holds one (x, y) per touch in touch_ids; all fingers of a
+        step go out in a single frame and steps are paced interval_ns apart against
+        absolute deadlines.
+        """
+        touches = []
+        for touch_id in touch_ids:
+            touch = self._active_touches.get(touch_id)
+            if touch is None:
+                msg = f"No active touch with ID {touch_id}"
+                raise ValueError(msg)
+            touches.append(touch)
+
+        motion = self._f_touch_motion
+        frame = self._f_frame
+        dispatch = self._f_dispatch
+        next_time = self._next_frame_time
+        device, ei = self._touch_arg, self._ei_arg
+        deadline = time.monotonic_ns()
+        for positions in path:
+            for touch, (x, y) in zip(touches, positions, strict=True):
+                motion(touch, x, y)
+            frame(device, next_time())
+            dispatch(ei)
+            deadline += interval_ns
+            _sleep_until(deadline)
 
     def touch_up(self, touch_id: int) -> None:
         """End an active touch."""
@@ -446,11 +620,10 @@ class EISClient:
         if touch is None:
             msg = f"No active touch with ID {touch_id}"
             raise ValueError(msg)
-        device = self._touch_device or self._pointer
-        _libei.ei_touch_up(touch)
-        _libei.ei_device_frame(device, self._now_us())
-        _libei.ei_touch_unref(touch)
-        self._flush()
+        device = self._touch_arg
+        self._f_touch_up(touch)
+        self._commit_frame(device)
+        self._f_touch_unref(touch)
 
     def close(self) -> None:
         """Clean up EIS connection."""
@@ -481,6 +654,11 @@ class EISClient:
             _libei.ei_unref(self._ei)
             self._ei = 0
 
+        for arg in (self._ei_arg, self._pointer_arg, self._keyboard_arg, self._touch_arg):
+            arg.value = None
+
+        self._bus.close()
+
 
 class InputBackend:
     """High-level input injection for an isolated KWin session.
@@ -520,15 +698,18 @@ class InputBackend:
         if double and click_count == 1:
             click_count = 2
 
-        btn_code = _BTN_CODES[button]
+        btn_code = button.code
         mod_codes = _resolve_modifiers(modifiers)
 
         self.mouse_move(x, y)
         time.sleep(0.02)
 
-        # Press modifier keys
-        for mod in mod_codes:
-            self._client.keyboard_key(mod, _PRESSED)
+        # Press modifier keys together in one frame
+        client = self._client
+        if mod_codes:
+            for mod in mod_codes:
+                client.keyboard_key_raw(mod, _PRESSED)
+            client.commit_keyboard()
             time.sleep(0.01)
 
         for i in range(click_count):
@@ -541,10 +722,12 @@ class InputBackend:
                 time.sleep(0.01)
             self._client.pointer_button(btn_code, _RELEASED)
 
-        # Release modifier keys in reverse order
-        for mod in reversed(mod_codes):
+        # Release modifier keys in reverse order, again in one frame
+        if mod_codes:
             time.sleep(0.01)
-            self._client.keyboard_key(mod, _RELEASED)
+            for mod in reversed(mod_codes):
+                client.keyboard_key_raw(mod, _RELEASED)
+            client.commit_keyboard()
 
     def mouse_scroll(
         self,
@@ -572,27 +755,38 @@ class InputBackend:
             dx = delta if horizontal else 0
             dy = delta if not horizontal else 0
             if steps > 1:
+                # Spread the remainder over the first steps: step i gets q + (i < r)
+                qx, rx = divmod(dx, steps)
+                qy, ry = divmod(dy, steps)
+                deadline = time.monotonic_ns()
                 for i in range(steps):
-                    frac_dx = dx // steps + (1 if i < dx % steps else 0) if dx else 0
-                    frac_dy = dy // steps + (1 if i < dy % steps else 0) if dy else 0
+                    frac_dx = qx + (i < rx)
+                    frac_dy = qy + (i < ry)
                     if frac_dx or frac_dy:
                         self._client.pointer_scroll_discrete(frac_dx, frac_dy)
-                    time.sleep(0.01)
+                    deadline += _STEP_INTERVAL_NS
+                    _sleep_until(deadline)
+                self._client.pointer_scroll_stop()
             else:
-                self._client.pointer_scroll_discrete(dx, dy)
-            self._client.pointer_scroll_stop()
+                with self._client.batch():
+                    self._client.pointer_scroll_discrete(dx, dy)
+                    self._client.pointer_scroll_stop()
         else:
             total_dx = float(delta) * _SCROLL_STEP_PIXELS if horizontal else 0.0
             total_dy = float(delta) * _SCROLL_STEP_PIXELS if not horizontal else 0.0
             if steps > 1:
                 step_dx = total_dx / steps
                 step_dy = total_dy / steps
+                deadline = time.monotonic_ns()
                 for _ in range(steps):
                     self._client.pointer_scroll(step_dx, step_dy)
-                    time.sleep(0.01)
+                    deadline += _STEP_INTERVAL_NS
+                    _sleep_until(deadline)
+                self._client.pointer_scroll_stop()
             else:
-                self._client.pointer_scroll(total_dx, total_dy)
-            self._client.pointer_scroll_stop()
+                with self._client.batch():
+                    self._client.pointer_scroll(total_dx, total_dy)
+                    self._client.pointer_scroll_stop()
 
     def mouse_drag(
         self,
@@ -613,49 +807,46 @@ class InputBackend:
             modifiers: Modifier keys to hold during drag (e.g. ["alt"], ["ctrl"]).
             waypoints: Intermediate points as (x, y, dwell_ms) tuples.
         """
-        btn_code = _BTN_CODES[button]
+        btn_code = button.code
         mod_codes = _resolve_modifiers(modifiers)
 
         self.mouse_move(from_x, from_y)
         time.sleep(0.05)
 
-        # Press modifier keys
-        for mod in mod_codes:
-            self._client.keyboard_key(mod, _PRESSED)
+        # Press modifier keys together in one frame
+        client = self._client
+        if mod_codes:
+            for mod in mod_codes:
+                client.keyboard_key_raw(mod, _PRESSED)
+            client.commit_keyboard()
             time.sleep(0.01)
 
-        self._client.pointer_button(btn_code, _PRESSED)
+        client.pointer_button(btn_code, _PRESSED)
         time.sleep(0.02)
 
-        # Build full path: start -> waypoints -> end
-        segments: list[tuple[int, int, int, int, int]] = []  # (fx, fy, tx, ty, dwell_ms)
-        prev_x, prev_y = from_x, from_y
-        if waypoints:
-            for wx, wy, dwell_ms in waypoints:
-                segments.append((prev_x, prev_y, wx, wy, dwell_ms))
-                prev_x, prev_y = wx, wy
-        segments.append((prev_x, prev_y, to_x, to_y, 0))
-
-        for seg_fx, seg_fy, seg_tx, seg_ty, dwell_ms in segments:
+        # Walk start -> waypoints -> end; each stop begins where the previous one ended
+        seg_fx, seg_fy = from_x, from_y
+        for seg_tx, seg_ty, dwell_ms in (*(waypoints or ()), (to_x, to_y, 0)):
             dx = seg_tx - seg_fx
             dy = seg_ty - seg_fy
-            steps = max(10, int((dx**2 + dy**2) ** 0.5 / 10))
-            for i in range(1, steps + 1):
-                frac = i / steps
-                cx = seg_fx + dx * frac
-                cy = seg_fy + dy * frac
-                self._client.pointer_move_absolute(cx, cy)
-                time.sleep(0.01)
+            steps = max(10, int(math.hypot(dx, dy) / 10))
+            # One multiply-add per coordinate: position i is start + i * step
+            step_dx, step_dy = dx / steps, dy / steps
+            path = [(seg_fx + step_dx * i, seg_fy + step_dy * i) for i in range(1, steps + 1)]
+            client.pointer_move_path(path, 0.01)
             if dwell_ms > 0:
                 time.sleep(dwell_ms / 1000.0)
+            seg_fx, seg_fy = seg_tx, seg_ty
 
         time.sleep(0.02)
-        self._client.pointer_button(btn_code, _RELEASED)
+        client.pointer_button(btn_code, _RELEASED)
 
-        # Release modifier keys in reverse order
-        for mod in reversed(mod_codes):
+        # Release modifier keys in reverse order, again in one frame
+        if mod_codes:
             time.sleep(0.01)
-            self._client.keyboard_key(mod, _RELEASED)
+            for mod in reversed(mod_codes):
+                client.keyboard_key_raw(mod, _RELEASED)
+            client.commit_keyboard()
 
     def mouse_button_down(self, x: int, y: int, button: MouseButton = MouseButton.LEFT) -> None:
         """Move to coordinates and press a mouse button without releasing.
@@ -664,7 +855,7 @@ class InputBackend:
             x, y: Coordinates.
             button: Mouse button to press.
         """
-        btn_code = _BTN_CODES[button]
+        btn_code = button.code
         self.mouse_move(x, y)
         time.sleep(0.02)
         self._client.pointer_button(btn_code, _PRESSED)
@@ -676,32 +867,37 @@ class InputBackend:
             x, y: Coordinates.
             button: Mouse button to release.
         """
-        btn_code = _BTN_CODES[button]
+        btn_code = button.code
         self.mouse_move(x, y)
         time.sleep(0.02)
         self._client.pointer_button(btn_code, _RELEASED)
 
     def keyboard_type(self, text: str) -> None:
         """Type a string of text character by character."""
-        for char in text:
-            entry = _CHAR_KEY_MAP.get(char)
-            if entry is None:
+        # Build the whole (keycode, state, delay_ns) plan, then replay it in one go
+        keycodes = _ASCII_KEYCODES
+        shift_flags = _ASCII_NEEDS_SHIFT
+        shift = _MODIFIER_KEYS["shift"]
+        events: list[tuple[int, int, int]] = []
+        append = events.append
+        # Only ASCII characters have keycodes, so the others can be dropped up front;
+        # iterating bytes yields code points directly.
+        for code_point in text.encode("ascii", "ignore"):
+            keycode = keycodes[code_point]
+            if not keycode:
                 continue
 
-            keycode, needs_shift = entry
-            if needs_shift:
-                self._client.keyboard_key(_MODIFIER_KEYS["shift"], _PRESSED)
-                time.sleep(0.01)
-
-            self._client.keyboard_key(keycode, _PRESSED)
-            time.sleep(0.01)
-            self._client.keyboard_key(keycode, _RELEASED)
-
-            if needs_shift:
-                time.sleep(0.01)
-                self._client.keyboard_key(_MODIFIER_KEYS["shift"], _RELEASED)
+            if shift_flags[code_point]:
+                # Shift and the key go down in one frame and come up in one frame
+                append((shift, _PRESSED, 0))
+                append((keycode, _PRESSED, _TYPE_HOLD_NS))
+                append((keycode, _RELEASED, 0))
+                append((shift, _RELEASED, _TYPE_GAP_NS))
+            else:
+                append((keycode, _PRESSED, _TYPE_HOLD_NS))
+                append((keycode, _RELEASED, _TYPE_GAP_NS))
 
-            time.sleep(0.02)
+        self._client.keyboard_replay(events)
 
     def keyboard_key(self, key: str) -> None:
         """Press a key combination (e.g., 'ctrl+c', 'Return', 'alt+F4').
@@ -712,20 +908,18 @@ class InputBackend:
         if keycode is None:
             return
 
-        # Press modifiers
+        client = self._client
+        # Modifiers then the main key go down in one frame; the key is held for 10ms
+        # and everything is released in reverse order in a second frame.
         for mod in modifiers:
-            self._client.keyboard_key(mod, _PRESSED)
-            time.sleep(0.01)
-
-        # Press and release main key
-        self._client.keyboard_key(keycode, _PRESSED)
+            client.keyboard_key_raw(mod, _PRESSED)
+        client.keyboard_key_raw(keycode, _PRESSED)
+        client.commit_keyboard()
         time.sleep(0.01)
-        self._client.keyboard_key(keycode, _RELEASED)
-
-        # Release modifiers in reverse order
+        client.keyboard_key_raw(keycode, _RELEASED)
         for mod in reversed(modifiers):
-            time.sleep(0.01)
-            self._client.keyboard_key(mod, _RELEASED)
+            client.keyboard_key_raw(mod, _RELEASED)
+        client.commit_keyboard()
 
     def keyboard_key_down(self, key: str) -> None:
         """Press (and hold) a key combination without releasing.
@@ -736,14 +930,17 @@ class InputBackend:
             key: Key to press (e.g., "ctrl", "shift+a", "alt").
         """
         modifiers, keycode = _parse_key_combo(key)
+        if not modifiers and keycode is None:
+            return
 
+        # The whole combo goes down in a single frame
+        client = self._client
         for mod in modifiers:
-            self._client.keyboard_key(mod, _PRESSED)
-            time.sleep(0.01)
-
+            client.keyboard_key_raw(mod, _PRESSED)
         if keycode is not None:
-            self._client.keyboard_key(keycode, _PRESSED)
-            time.sleep(0.01)
+            client.keyboard_key_raw(keycode, _PRESSED)
+        client.commit_keyboard()
+        time.sleep(0.01)
 
     def keyboard_key_up(self, key: str) -> None:
         """Release a previously pressed key combination.
@@ -754,14 +951,17 @@ class InputBackend:
             key: Key to release (e.g., "ctrl", "shift+a", "alt").
         """
         modifiers, keycode = _parse_key_combo(key)
+        if not modifiers and keycode is None:
+            return
 
+        # The whole combo comes up in a single frame
+        client = self._client
         if keycode is not None:
-            self._client.keyboard_key(keycode, _RELEASED)
-            time.sleep(0.01)
-
+            client.keyboard_key_raw(keycode, _RELEASED)
         for mod in reversed(modifiers):
-            self._client.keyboard_key(mod, _RELEASED)
-            time.sleep(0.01)
+            client.keyboard_key_raw(mod, _RELEASED)
+        client.commit_keyboard()
+        time.sleep(0.01)
 
     def touch_tap(self, x: int, y: int, hold_ms: int = 0) -> None:
         """Tap at the given coordinates.
@@ -796,16 +996,12 @@ class InputBackend:
         dx = to_x - from_x
         dy = to_y - from_y
 
-        tid = self._client.touch_down(float(from_x), float(from_y))
-        step_delay = max(0.001, duration_ms / 1000.0 / steps)
-
-        for i in range(1, steps + 1):
-            frac = i / steps
-            cx = from_x + dx * frac
-            cy = from_y + dy * frac
-            self._client.touch_move(tid, cx, cy)
-            time.sleep(step_delay)
+        step_ns = max(1_000_000, duration_ms * 1_000_000 // steps)
+        step_dx, step_dy = dx / steps, dy / steps
+        path = [[(from_x + step_dx * i, from_y + step_dy * i)] for i in range(1, steps + 1)]
 
+        tid = self._client.touch_down(float(from_x), float(from_y))
+        self._client.touch_move_path([tid], path, step_ns)
         self._client.touch_up(tid)
 
     def touch_pinch(
@@ -825,22 +1021,26 @@ class InputBackend:
             duration_ms: Duration of the gesture.
         """
         steps = max(10, duration_ms // 10)
-        step_delay = max(0.001, duration_ms / 1000.0 / steps)
+        step_ns = max(1_000_000, duration_ms * 1_000_000 // steps)
 
         # Two fingers start symmetrically on the x-axis
         half_start = start_distance / 2.0
-        tid1 = self._client.touch_down(float(center_x - half_start), float(center_y))
-        tid2 = self._client.touch_down(float(center_x + half_start), float(center_y))
+        half_delta = end_distance / 2.0 - half_start
+        cx, cy = float(center_x), float(center_y)
+        # Finger positions for every step, computed before the fingers go down
+        half_step = half_delta / steps
+        halves = [half_start + half_step * i for i in range(1, steps + 1)]
+        path = [[(cx - half, cy), (cx + half, cy)] for half in halves]
 
-        for i in range(1, steps + 1):
-            frac = i / steps
-            half = half_start + (end_distance / 2.0 - half_start) * frac
-            self._client.touch_move(tid1, float(center_x - half), float(center_y))
-            self._client.touch_move(tid2, float(center_x + half), float(center_y))
-            time.sleep(step_delay)
+        with self._client.batch():
+            tid1 = self._client.touch_down(cx - half_start, cy)
+            tid2 = self._client.touch_down(cx + half_start, cy)
+
+        self._client.touch_move_path([tid1, tid2], path, step_ns)
 
-        self._client.touch_up(tid1)
-        self._client.touch_up(tid2)
+        with self._client.batch():
+            self._client.touch_up(tid1)
+            self._client.touch_up(tid2)
 
     def touch_multi_swipe(
         self,
@@ -862,27 +1062,28 @@ class InputBackend:
         steps = max(10, duration_ms // 10)
         dx = to_x - from_x
         dy = to_y - from_y
-        step_delay = max(0.001, duration_ms / 1000.0 / steps)
+        step_ns = max(1_000_000, duration_ms * 1_000_000 // steps)
         finger_spacing = 20  # pixels between fingers
 
         # Start touches spread vertically around center
-        tids: list[int] = []
-        for f in range(fingers):
-            offset = (f - (fingers - 1) / 2.0) * finger_spacing
-            tid = self._client.touch_down(float(from_x), float(from_y + offset))
-            tids.append(tid)
-
+        offsets = [(f - (fingers - 1) / 2.0) * finger_spacing for f in range(fingers)]
+        # Per-finger start rows and per-step deltas are fixed, so each step only
+        # scales the deltas once.
+        base_ys = [from_y + offset for offset in offsets]
+        step_dx, step_dy = dx / steps, dy / steps
+        path: list[list[tuple[float, float]]] = []
         for i in range(1, steps + 1):
-            frac = i / steps
-            cx = from_x + dx * frac
-            cy = from_y + dy * frac
-            for f, tid in enumerate(tids):
-                offset = (f - (fingers - 1) / 2.0) * finger_spacing
-                self._client.touch_move(tid, cx, cy + offset)
-            time.sleep(step_delay)
+            cx = from_x + step_dx * i
+            move_y = step_dy * i
+            path.append([(cx, base_y + move_y) for base_y in base_ys])
 
-        for tid in tids:
-            self._client.touch_up(tid)
+        with self._client.batch():
+            tids = [self._client.touch_down(float(from_x), base_y) for base_y in base_ys]
+        self._client.touch_move_path(tids, path, step_ns)
+
+        with self._client.batch():
+            for tid in tids:
+                self._client.touch_up(tid)
 
     def keyboard_type_unicode(self, text: str, dbus_address: str | None = None) -> bool:
         """Type arbitrary Unicode text using wtype or clipboard fallback.
@@ -894,32 +1095,46 @@ class InputBackend:
         Returns:
             True if text was typed successfully.
         """
-        env = dict(__import__("os").environ)
-        if dbus_address:
-            env["DBUS_SESSION_BUS_ADDRESS"] = dbus_address
+        # Only copy the environment when there is something to override; env=None
+        # lets the helpers inherit ours as is.
+        env = {**os.environ, "DBUS_SESSION_BUS_ADDRESS": dbus_address} if dbus_address else None
 
         # Try wtype first
-        if shutil.which("wtype"):
+        if wtype := find_executable("wtype"):
+            # A single argv string is capped by the kernel (MAX_ARG_STRLEN, 128 KiB),
+            # so long text is streamed through stdin ("-", wtype >= 0.4) instead.
+            encoded = text.encode()
+            if len(encoded) < _WTYPE_ARGV_LIMIT:
+                cmd, stdin_data = [wtype, "--", text], None
+            else:
+                cmd, stdin_data = [wtype, "-"], encoded
             result = subprocess.run(
-                ["wtype", "--", text],
+                cmd,
                 env=env,
+                input=stdin_data,
                 capture_output=True,
                 timeout=5,
             )
             return result.returncode == 0
 
         # Fallback: clipboard paste via wl-copy + Ctrl+V
-        # Use Popen + DEVNULL to avoid pipe-blocking from wl-copy's forked child
-        if shutil.which("wl-copy"):
-            cp = subprocess.Popen(
-                ["wl-copy", "--", text],
-                env=env,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            time.sleep(0.1)  # Wait for fork to complete
-            if cp.poll() is None or cp.returncode == 0:
+        # wl-copy takes the selection before forking its serving child, so the
+        # parent exiting means the clipboard is owned and Ctrl+V can be sent right
+        # away. DEVNULL keeps the child from holding our pipes open.
+        if wl_copy := find_executable("wl-copy"):
+            try:
+                cp = subprocess.run(
+                    [wl_copy, "--", text],
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=5,
+                    check=False,
+                )
+            except subprocess.TimeoutExpired:
+                return False
+            if cp.returncode == 0:
                 self.keyboard_key("ctrl+v")
                 return True
 
@@ -946,36 +1161,59 @@ def _key_name_to_evdev(name: str) -> int | None:
     return None
 
 
-def _resolve_modifiers(modifiers: list[str] | None) -> list[int]:
+def _resolve_modifiers(modifiers: list[str] | None) -> tuple[int, ...]:
     """Resolve modifier key names to evdev keycodes."""
     if not modifiers:
-        return []
-    codes: list[int] = []
-    for mod in modifiers:
-        code = _MODIFIER_KEYS.get(mod.lower())
-        if code is not None:
-            codes.append(code)
-    return codes
+        return ()
+    return _resolve_modifier_names(tuple(modifiers))
+
+
+@functools.lru_cache(maxsize=64)
+def _resolve_modifier_names(modifiers: tuple[str, ...]) -> tuple[int, ...]:
+    """Cached body of _resolve_modifiers(); the same few modifier sets recur."""
+    mod_get = _MODIFIER_KEYS.get
+    return tuple(code for mod in modifiers if (code := mod_get(mod.lower())) is not None)
 
 
-def _parse_key_combo(key: str) -> tuple[list[int], int | None]:
+@functools.lru_cache(maxsize=256)
+def _parse_key_combo(key: str) -> tuple[tuple[int, ...], int | None]:
     """Parse a key combo string into (modifier_codes, main_keycode).
 
-    Returns a tuple of (list of modifier evdev keycodes, main key evdev keycode or None).
+    Returns a tuple of (modifier evdev keycodes, main key evdev keycode or None).
+    Results are cached (and therefore immutable): agents tend to send the same
+    few combos over and over.
     """
-    parts = key.split("+")
+    mod_get = _MODIFIER_KEYS.get
     modifiers: list[int] = []
     main_key: str | None = None
 
-    for part in parts:
-        part_lower = part.strip().lower()
-        if part_lower in _MODIFIER_KEYS:
-            modifiers.append(_MODIFIER_KEYS[part_lower])
+    for part in map(str.strip, key.split("+")):
+        if (code := mod_get(part.lower())) is not None:
+            modifiers.append(code)
         else:
-            main_key = part.strip()
+            main_key = part
 
     keycode: int | None = None
     if main_key is not None:
         keycode = _key_name_to_evdev(main_key)
 
-    return modifiers, keycode
+    return tuple(modifiers), keycode
+
+
+# Helper binaries found on PATH, by name; misses are not cached
+_executables: dict[str, str] = {}
+
+
+def find_executable(name: str) -> str | None:
+    """Resolve a helper binary on PATH, caching successful lookups (shutil.which).
+
+    Helpers such as wtype and wl-copy do not disappear during a session, so
+    repeated calls skip the PATH scan and its stat() calls. A missing helper is
+    looked up again, so one installed after the server started is picked up.
+    """
+    path = _executables.get(name)
+    if path is None:
+        path = shutil.which(name)
+        if path is not None:
+            _executables[name] = path
+    return path
@@ -2,14 +2,114 @@
 
 from __future__ import annotations
 
+import contextlib
 import os
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import dbus
 import dbus.bus
 
+from kwin_mcp.input import find_executable
+
+# zlib level 1 encodes screenshots several times faster than Pillow's default (6)
+# for only slightly larger files.
+_PNG_COMPRESS_LEVEL = 1
+
+# ScreenShot2 proxies, one per session bus, reused across captures
+_screenshot_ifaces: dict[str, tuple[dbus.bus.BusConnection, dbus.Interface]] = {}
+_screenshot_ifaces_lock = threading.Lock()
+
+
+def _screenshot_iface(dbus_address: str) -> dbus.Interface:
+    """Return the cached ScreenShot2 interface for a session bus, connecting once."""
+    with _screenshot_ifaces_lock:
+        cached = _screenshot_ifaces.get(dbus_address)
+        if cached is None:
+            bus = dbus.bus.BusConnection(dbus_address)
+            screenshot_obj = bus.get_object("org.kde.KWin", "/org/kde/KWin/ScreenShot2")
+            cached = (bus, dbus.Interface(screenshot_obj, "org.kde.KWin.ScreenShot2"))
+            _screenshot_ifaces[dbus_address] = cached
+        return cached[1]
+
+
+# Output directories already created by this process
+_created_dirs: set[Path] = set()
+
+
+def _ensure_dir(path: Path) -> None:
+    """Create an output directory once; later captures into it skip the mkdir."""
+    if path not in _created_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _created_dirs.add(path)
+
+
+def prewarm_screenshot_connection(dbus_address: str) -> None:
+    """Open the session's cached ScreenShot2 connection ahead of the first capture.
+
+    Failures are ignored; the first capture then connects (or falls back) itself.
+    """
+    with contextlib.suppress(dbus.DBusException):
+        _screenshot_iface(dbus_address)
+
+
+def release_screenshot_connection(dbus_address: str) -> None:
+    """Close the cached ScreenShot2 connection for a session bus, if any.
+
+    Call when the session owning the bus stops, so its connection does not outlive it.
+    """
+    with _screenshot_ifaces_lock:
+        cached = _screenshot_ifaces.pop(dbus_address, None)
+    if cached is not None:
+        cached[0].close()
+
+
+def _capture_raw(
+    dbus_address: str, method: str, options: dict[str, dbus.Boolean]
+) -> tuple[bytearray, int, int, int]:
+    """Call a ScreenShot2 capture method and read the raw frame from its pipe.
+
+    Returns (data, width, height, stride). The reply carries the frame geometry,
+    so the pixels are read straight into a buffer of the final size. A D-Bus error
+    drops the cached proxy so the next capture reconnects (e.g. after the session
+    was restarted).
+    """
+    iface = _screenshot_iface(dbus_address)
+    read_fd, write_fd = os.pipe()
+    try:
+        try:
+            results = getattr(iface, method)(options, dbus.types.UnixFd(write_fd))
+        except dbus.DBusException:
+            release_screenshot_connection(dbus_address)
+            raise
+        finally:
+            os.close(write_fd)
+
+        width = int(results["width"])
+        height = int(results["height"])
+        stride = int(results["stride"])
+
+        data = bytearray(stride * height)
+        view = memoryview(data)
+        size = 0
+        try:
+            while size < len(data):
+                n = os.readv(read_fd, [view[size:]])
+                if not n:
+                    break
+                size += n
+        finally:
+            view.release()
+    finally:
+        os.close(read_fd)
+
+    if size < len(data):
+        del data[size:]
+    return data, width, height, stride
+
 
 def capture_screenshot_to_file(
     dbus_address: str = "",
@@ -17,6 +117,7 @@ def capture_screenshot_to_file(
     *,
     include_cursor: bool = False,
     output_dir: Path | None = None,
+    compress_level: int = _PNG_COMPRESS_LEVEL,
 ) -> Path:
     """Capture a screenshot and save to a file.
 
@@ -25,17 +126,33 @@ def capture_screenshot_to_file(
         wayland_socket: Wayland socket name for the isolated session.
         include_cursor: Whether to include the mouse cursor.
         output_dir: Directory to save the screenshot. Uses /tmp if not specified.
+        compress_level: zlib level (0-9) for the in-process PNG encode.
 
     Returns:
         Absolute path of the saved PNG file.
     """
     if output_dir is None:
         output_dir = Path("/tmp")
-    output_dir.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(output_dir)
 
     timestamp = time.strftime("%Y%m%d_%H%M%S")
     output_path = output_dir / f"screenshot_{timestamp}.png"
 
+    # The compositor already holds the frame; ask it over D-Bus and only spawn
+    # spectacle when ScreenShot2 is unavailable (e.g. permission checks enabled).
+    if dbus_address:
+        try:
+            _capture_workspace_dbus(
+                dbus_address,
+                output_path,
+                include_cursor=include_cursor,
+                compress_level=compress_level,
+            )
+        except (dbus.DBusException, RuntimeError, ValueError, OSError):
+            pass
+        else:
+            return output_path
+
     _capture_via_spectacle(
         dbus_address,
         wayland_socket,
@@ -45,11 +162,39 @@ def capture_screenshot_to_file(
     return output_path
 
 
+def _capture_workspace_dbus(
+    dbus_address: str,
+    output_path: Path,
+    *,
+    include_cursor: bool = False,
+    compress_level: int = _PNG_COMPRESS_LEVEL,
+) -> None:
+    """Capture all screens via ScreenShot2 CaptureWorkspace and save as PNG.
+
+    Equivalent to spectacle's full-screen mode (-f), without spawning a process
+    or round-tripping the image through a temp file.
+    """
+    from PIL import Image
+
+    options = {
+        "include-cursor": dbus.Boolean(include_cursor),
+        "native-resolution": dbus.Boolean(True),
+    }
+    data, width, height, stride = _capture_raw(dbus_address, "CaptureWorkspace", options)
+    if not data:
+        msg = "KWin ScreenShot2 returned no data"
+        raise RuntimeError(msg)
+
+    img = Image.frombytes("RGBA", (width, height), data, "raw", "BGRA", stride)
+    img.save(output_path, "PNG", compress_level=compress_level)
+
+
 def capture_screenshot_dbus(
     dbus_address: str,
     output_path: Path,
     *,
     include_cursor: bool = False,
+    compress_level: int = _PNG_COMPRESS_LEVEL,
 ) -> Path:
     """Capture screenshot directly via KWin ScreenShot2 D-Bus interface.
 
@@ -64,46 +209,23 @@ def capture_screenshot_dbus(
         dbus_address: D-Bus session bus address for the isolated session.
         output_path: Path to save the PNG file.
         include_cursor: Whether to include the mouse cursor.
+        compress_level: zlib level (0-9) for the PNG encode; higher is smaller but slower.
 
     Returns:
         The output_path with the saved PNG file.
     """
     from PIL import Image
 
-    bus = dbus.bus.BusConnection(dbus_address)
-    screenshot_obj = bus.get_object("org.kde.KWin", "/org/kde/KWin/ScreenShot2")
-    iface = dbus.Interface(screenshot_obj, "org.kde.KWin.ScreenShot2")
-
-    read_fd, write_fd = os.pipe()
-    try:
-        options = {"include-cursor": dbus.Boolean(include_cursor)}
-        results = iface.CaptureActiveScreen(options, dbus.types.UnixFd(write_fd))
-    finally:
-        os.close(write_fd)
-
-    try:
-        chunks = []
-        while True:
-            chunk = os.read(read_fd, 65536)
-            if not chunk:
-                break
-            chunks.append(chunk)
-    finally:
-        os.close(read_fd)
-
-    data = b"".join(chunks)
+    options = {"include-cursor": dbus.Boolean(include_cursor)}
+    data, width, height, stride = _capture_raw(dbus_address, "CaptureActiveScreen", options)
     if not data:
         msg = "KWin ScreenShot2 returned no data"
         raise RuntimeError(msg)
 
-    width = int(results["width"])
-    height = int(results["height"])
-    stride = int(results["stride"])
-
     # KWin returns raw ARGB32_Premultiplied (Qt format 6) in native byte order.
     # On little-endian systems, bytes are stored as BGRA.
     img = Image.frombytes("RGBA", (width, height), data, "raw", "BGRA", stride)
-    img.save(output_path, "PNG")
+    img.save(output_path, "PNG", compress_level=compress_level)
     return output_path
 
 
@@ -113,6 +235,7 @@ def capture_frame_burst(
     delays_ms: list[int],
     *,
     include_cursor: bool = False,
+    compress_level: int = _PNG_COMPRESS_LEVEL,
 ) -> list[Path]:
     """Capture multiple screenshots at specified delays after an action.
 
@@ -128,65 +251,51 @@ def capture_frame_burst(
         output_dir: Directory to save the frame PNG files.
         delays_ms: List of delays in milliseconds (e.g., [0, 50, 100, 200, 500]).
         include_cursor: Whether to include the mouse cursor.
+        compress_level: zlib level (0-9) for the PNG encodes.
 
     Returns:
         List of paths to the captured PNG files, ordered by delay.
     """
     from PIL import Image
 
-    output_dir.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(output_dir)
     sorted_delays = sorted(delays_ms)
 
-    # Reuse a single D-Bus connection for all captures
-    bus = dbus.bus.BusConnection(dbus_address)
-    screenshot_obj = bus.get_object("org.kde.KWin", "/org/kde/KWin/ScreenShot2")
-    iface = dbus.Interface(screenshot_obj, "org.kde.KWin.ScreenShot2")
+    # The session's cached D-Bus connection is shared by all captures
     options = {"include-cursor": dbus.Boolean(include_cursor)}
 
     # Phase 1: Capture all raw frames with accurate timing
-    raw_frames: list[tuple[bytes, int, int, int]] = []  # (data, width, height, stride)
-    start = time.monotonic()
+    raw_frames: list[tuple[bytearray, int, int, int]] = []  # (data, width, height, stride)
+    # Integer-nanosecond deadlines from one start point; since Python 3.11
+    # time.sleep() waits with clock_nanosleep() on the monotonic clock.
+    start_ns = time.monotonic_ns()
     for delay_ms in sorted_delays:
-        target_time = start + delay_ms / 1000.0
-        now = time.monotonic()
-        if now < target_time:
-            time.sleep(target_time - now)
+        remaining_ns = start_ns + delay_ms * 1_000_000 - time.monotonic_ns()
+        if remaining_ns > 0:
+            time.sleep(remaining_ns / 1e9)
 
-        read_fd, write_fd = os.pipe()
-        try:
-            results = iface.CaptureActiveScreen(options, dbus.types.UnixFd(write_fd))
-        finally:
-            os.close(write_fd)
-        try:
-            chunks = []
-            while True:
-                chunk = os.read(read_fd, 65536)
-                if not chunk:
-                    break
-                chunks.append(chunk)
-        finally:
-            os.close(read_fd)
-
-        raw_frames.append(
-            (
-                b"".join(chunks),
-                int(results["width"]),
-                int(results["height"]),
-                int(results["stride"]),
-            )
-        )
+        raw_frames.append(_capture_raw(dbus_address, "CaptureActiveScreen", options))
 
-    # Phase 2: Convert raw frames to PNG (timing-insensitive)
-    frame_paths: list[Path] = []
-    for i, (delay_ms, (data, width, height, stride)) in enumerate(
-        zip(sorted_delays, raw_frames, strict=True)
-    ):
-        if not data:
-            continue
-        frame_path = output_dir / f"frame_{i:03d}_{delay_ms}ms.png"
+    # Phase 2: Convert raw frames to PNG (timing-insensitive). Pillow releases the
+    # GIL while encoding, so frames are encoded in parallel threads.
+    def encode(frame_path: Path, data: bytearray, width: int, height: int, stride: int) -> None:
         img = Image.frombytes("RGBA", (width, height), data, "raw", "BGRA", stride)
-        img.save(frame_path, "PNG")
-        frame_paths.append(frame_path)
+        img.save(frame_path, "PNG", compress_level=compress_level)
+
+    frame_paths: list[Path] = []
+    futures = []
+    workers = max(1, min(len(raw_frames), os.cpu_count() or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i, (delay_ms, (data, width, height, stride)) in enumerate(
+            zip(sorted_delays, raw_frames, strict=True)
+        ):
+            if not data:
+                continue
+            frame_path = output_dir / f"frame_{i:03d}_{delay_ms}ms.png"
+            futures.append(executor.submit(encode, frame_path, data, width, height, stride))
+            frame_paths.append(frame_path)
+        for future in futures:
+            future.result()
 
     return frame_paths
 
@@ -199,7 +308,8 @@ def _capture_via_spectacle(
     include_cursor: bool = False,
 ) -> None:
     """Capture screenshot using spectacle CLI in background mode."""
-    cmd = ["spectacle", "-b", "-f", "-n", "-o", str(output_path)]
+    spectacle = find_executable("spectacle") or "spectacle"
+    cmd = [spectacle, "-b", "-f", "-n", "-o", str(output_path)]
     if include_cursor:
         cmd.append("-p")
 
@@ -216,7 +326,9 @@ def _capture_via_spectacle(
         result = subprocess.run(
             cmd,
             env=env,
-            capture_output=True,
+            # Only stderr is reported (on failure); stdout is never read
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             timeout=10,
             check=False,
         )
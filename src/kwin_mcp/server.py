@@ -6,22 +6,95 @@ delegating all logic to AutomationEngine in core.py.
 
 from __future__ import annotations
 
-from typing import Annotated
+import asyncio
+import contextlib
+from typing import TYPE_CHECKING, Annotated, Any
 
 from mcp.server.fastmcp import FastMCP
-from pydantic import Field
+from pydantic import Field, NonNegativeInt
 
 from kwin_mcp.core import AutomationEngine
 
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable
+
 mcp = FastMCP("kwin-mcp")
 _engine = AutomationEngine()
 
+# Tools that mostly wait on a helper process run the engine call in a worker thread
+# (_in_thread) so the event loop keeps serving other requests meanwhile.
+# Clipboard calls are serialized among themselves since clipboard_set replaces the
+# engine's wl-copy process.
+_clipboard_lock = asyncio.Lock()
+
+
+class _SessionGate:
+    """Keep session_start/session_stop from running alongside worker-thread tools.
+
+    Worker-thread tools may run together; a session change waits for them to
+    finish and holds off new ones until it is done.
+    """
+
+    def __init__(self) -> None:
+        self._cond = asyncio.Condition()
+        self._users = 0
+        self._changes = 0  # Session changes running or waiting to run
+
+    @contextlib.asynccontextmanager
+    async def use(self) -> AsyncIterator[None]:
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._changes)
+            self._users += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._users -= 1
+                self._cond.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def change(self) -> AsyncIterator[None]:
+        async with self._cond:
+            self._changes += 1
+            try:
+                await self._cond.wait_for(lambda: not self._users)
+            except BaseException:
+                self._changes -= 1
+                self._cond.notify_all()
+                raise
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._changes -= 1
+                self._cond.notify_all()
+
+
+_session_gate = _SessionGate()
+
+
+async def _in_thread[T](func: Callable[..., T], /, **kwargs: Any) -> T:
+    """Run an engine call in a worker thread while no session change is in progress."""
+    async with _session_gate.use():
+        future = asyncio.ensure_future(asyncio.to_thread(func, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # A cancelled request stops waiting, but the thread runs on; hold the gate
+            # until it returns so no session change happens under it.
+            while not future.done():
+                with contextlib.suppress(asyncio.CancelledError):
+                    await asyncio.wait({future})
+            if not future.cancelled():
+                future.exception()  # Mark retrieved; the caller is gone
+            raise
+
 
 # ── Session management ──────────────────────────────────────────────────
 
 
 @mcp.tool()
-def session_start(
+async def session_start(
     app_command: Annotated[
         str,
         Field(
@@ -71,27 +144,29 @@ def session_start(
     call session_stop first. Returns session status including the Wayland socket
     path, launched app PID (if any), and input backend availability.
     """
-    return _engine.session_start(
-        app_command=app_command,
-        screen_width=screen_width,
-        screen_height=screen_height,
-        enable_clipboard=enable_clipboard,
-        keep_screenshots=keep_screenshots,
-        isolate_home=isolate_home,
-        keep_home=keep_home,
-        env=env,
-    )
+    async with _session_gate.change():
+        return _engine.session_start(
+            app_command=app_command,
+            screen_width=screen_width,
+            screen_height=screen_height,
+            enable_clipboard=enable_clipboard,
+            keep_screenshots=keep_screenshots,
+            isolate_home=isolate_home,
+            keep_home=keep_home,
+            env=env,
+        )
 
 
 @mcp.tool()
-def session_stop() -> str:
+async def session_stop() -> str:
     """Stop the isolated KWin session and clean up.
 
     Terminates KWin, all launched app processes, and the D-Bus session.
     Cleans up temporary files and clipboard processes. Safe to call when
     no session is running (returns "No session running.").
     """
-    return _engine.session_stop()
+    async with _session_gate.change():
+        return _engine.session_stop()
 
 
 # ── Screenshot / Accessibility ───────────────────────────────────────────
@@ -127,6 +202,20 @@ def accessibility_tree(
             "but their children are still traversed to find deeper matches."
         ),
     ] = "",
+    include_actions: Annotated[
+        bool,
+        Field(
+            description="List each element's available actions. Set to false for a faster "
+            "tree when actions are not needed."
+        ),
+    ] = True,
+    showing_only: Annotated[
+        bool,
+        Field(
+            description='Only list elements in the "showing" state, hiding off-screen '
+            "widgets (inactive tabs, collapsed menus). Shrinks the tree for large apps."
+        ),
+    ] = False,
 ) -> str:
     """Get the accessibility tree of apps in the isolated session.
 
@@ -134,7 +223,13 @@ def accessibility_tree(
     and bounding box coordinates. Use this to understand UI structure before
     interacting with elements.
     """
-    return _engine.accessibility_tree(app_name=app_name, max_depth=max_depth, role=role)
+    return _engine.accessibility_tree(
+        app_name=app_name,
+        max_depth=max_depth,
+        role=role,
+        include_actions=include_actions,
+        showing_only=showing_only,
+    )
 
 
 @mcp.tool()
@@ -158,14 +253,21 @@ def find_ui_elements(
             "Common states: active, focused, visible, enabled, checked, selected, expanded."
         ),
     ] = None,
+    role: Annotated[
+        str,
+        Field(
+            description='Only return elements with exactly this role (e.g. "push button", '
+            '"text", "check box"). Empty string = any role.'
+        ),
+    ] = "",
 ) -> str:
-    """Find UI elements matching a search query and/or required AT-SPI2 states.
+    """Find UI elements matching a search query, role and/or required AT-SPI2 states.
 
     Returns a list of matching elements with their role, name, bounding box
     (x, y, width, height), and available actions. Use this to locate specific
     buttons, inputs, or labels before clicking or interacting.
     """
-    return _engine.find_ui_elements(query=query, app_name=app_name, states=states)
+    return _engine.find_ui_elements(query=query, app_name=app_name, states=states, role=role)
 
 
 # ── Mouse tools ──────────────────────────────────────────────────────────
@@ -195,7 +297,7 @@ def mouse_click(
         Field(description="Duration to hold button pressed before release (ms, for long-press)."),
     ] = 0,
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(
             description="Capture screenshots at these delays (ms) after the click. "
             "Example: [0, 50, 200] captures 3 frames showing the click effect."
@@ -225,7 +327,7 @@ def mouse_move(
     x: Annotated[int, Field(description="X coordinate in pixels.")],
     y: Annotated[int, Field(description="Y coordinate in pixels.")],
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(
             description="Capture screenshots at these delays (ms) after moving. "
             "Useful for observing hover effects and tooltip animations."
@@ -300,7 +402,7 @@ def mouse_drag(
         ),
     ] = None,
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(description="Capture screenshots at these delays (ms) after the drag completes."),
     ] = None,
 ) -> str:
@@ -368,7 +470,7 @@ def keyboard_type(
         ),
     ],
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(
             description="Capture screenshots at these delays (ms) after typing. "
             "Useful for observing autocomplete popups and input validation."
@@ -391,7 +493,7 @@ def keyboard_type_unicode(
         Field(description="Unicode text to type (supports any script: Korean, CJK, emoji, etc.)."),
     ],
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(description="Capture screenshots at these delays (ms) after typing."),
     ] = None,
 ) -> str:
@@ -415,7 +517,7 @@ def keyboard_key(
         ),
     ],
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(
             description="Capture screenshots at these delays (ms) after the key press. "
             "Useful for observing menu openings and dialog transitions."
@@ -475,7 +577,7 @@ def touch_tap(
         ),
     ] = 0,
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(description="Capture screenshots at these delays (ms) after the tap."),
     ] = None,
 ) -> str:
@@ -495,7 +597,7 @@ def touch_swipe(
     to_y: Annotated[int, Field(description="Ending Y coordinate in pixels.")],
     duration_ms: Annotated[int, Field(description="Duration of the swipe in milliseconds.")] = 300,
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(description="Capture screenshots at these delays (ms) after the swipe."),
     ] = None,
 ) -> str:
@@ -532,7 +634,7 @@ def touch_pinch(
         int, Field(description="Duration of the gesture in milliseconds.")
     ] = 500,
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(description="Capture screenshots at these delays (ms) after the pinch."),
     ] = None,
 ) -> str:
@@ -564,7 +666,7 @@ def touch_multi_swipe(
     fingers: Annotated[int, Field(description="Number of fingers (2-5).")] = 3,
     duration_ms: Annotated[int, Field(description="Duration of the swipe in milliseconds.")] = 300,
     screenshot_after_ms: Annotated[
-        list[int] | None,
+        list[NonNegativeInt] | None,
         Field(description="Capture screenshots at these delays (ms) after the swipe."),
     ] = None,
 ) -> str:
@@ -584,22 +686,54 @@ def touch_multi_swipe(
     )
 
 
+# ── Batched actions ──────────────────────────────────────────────────────
+
+
+@mcp.tool()
+def batch_actions(
+    actions: Annotated[
+        list[dict[str, Any]],
+        Field(
+            description='Steps to run in order. Each step has an "action" naming an input tool '
+            "(mouse_click, mouse_move, mouse_scroll, mouse_drag, mouse_button_down, "
+            "mouse_button_up, keyboard_type, keyboard_type_unicode, keyboard_key, "
+            "keyboard_key_down, keyboard_key_up, touch_tap, touch_swipe, touch_pinch, "
+            "touch_multi_swipe) or dbus_call plus that tool's parameters, e.g. "
+            '{"action": "mouse_click", "x": 100, "y": 200}. '
+            'Use {"action": "sleep", "ms": 500} to pause between steps.'
+        ),
+    ],
+    screenshot_after_ms: Annotated[
+        list[NonNegativeInt] | None,
+        Field(description="Capture screenshots at these delays (ms) after the last step."),
+    ] = None,
+) -> str:
+    """Run several input actions in a single call.
+
+    Saves a round-trip per step for scripted sequences such as
+    click, type, Tab, type, Enter, or several D-Bus calls in a row. Stops at
+    the first failing step and returns one result line per step that ran.
+    """
+    return _engine.batch_actions(actions=actions, screenshot_after_ms=screenshot_after_ms)
+
+
 # ── Clipboard tools ──────────────────────────────────────────────────────
 
 
 @mcp.tool()
-def clipboard_get() -> str:
+async def clipboard_get() -> str:
     """Read the current clipboard content in the isolated session.
 
     Requires enable_clipboard=true in session_start and wl-clipboard
     installed. Returns the clipboard text or an error message if clipboard
     is not enabled or empty.
     """
-    return _engine.clipboard_get()
+    async with _clipboard_lock:
+        return await _in_thread(_engine.clipboard_get)
 
 
 @mcp.tool()
-def clipboard_set(
+async def clipboard_set(
     text: Annotated[str, Field(description="Text to copy to clipboard.")],
 ) -> str:
     """Set the clipboard content in the isolated session.
@@ -608,14 +742,15 @@ def clipboard_set(
     installed. The content remains available until replaced by another
     clipboard_set call or the session ends.
     """
-    return _engine.clipboard_set(text=text)
+    async with _clipboard_lock:
+        return await _in_thread(_engine.clipboard_set, text=text)
 
 
 # ── Wait-for-UI tools ───────────────────────────────────────────────────
 
 
 @mcp.tool()
-def wait_for_element(
+async def wait_for_element(
     query: Annotated[
         str,
         Field(
@@ -628,7 +763,9 @@ def wait_for_element(
         Field(description="Filter to a specific app name (empty string = all apps)."),
     ] = "",
     timeout_ms: Annotated[int, Field(description="Maximum wait time in milliseconds.")] = 5000,
-    poll_interval_ms: Annotated[int, Field(description="Polling interval in milliseconds.")] = 200,
+    poll_interval_ms: Annotated[
+        int, Field(description="Polling interval in milliseconds (time between tree walks).")
+    ] = 200,
     expected_states: Annotated[
         list[str] | None,
         Field(
@@ -644,7 +781,8 @@ def wait_for_element(
     Returns matching elements in the same format as find_ui_elements, or a
     timeout error message.
     """
-    return _engine.wait_for_element(
+    return await _in_thread(
+        _engine.wait_for_element,
         query=query,
         app_name=app_name,
         timeout_ms=timeout_ms,
@@ -657,7 +795,7 @@ def wait_for_element(
 
 
 @mcp.tool()
-def launch_app(
+async def launch_app(
     command: Annotated[
         str,
         Field(description='Command to launch (e.g. "kcalc" or "/path/to/app --arg").'),
@@ -666,13 +804,25 @@ def launch_app(
         dict[str, str] | None,
         Field(description="Extra environment variables to pass to the app."),
     ] = None,
+    focus_timeout_ms: Annotated[
+        int,
+        Field(
+            ge=0,
+            le=25000,
+            description="If > 0, wait up to this many milliseconds (max 25000) for the app's "
+            "first window and focus it, saving separate wait_for_element and focus_window "
+            "calls. The window is matched by the launched process's PID. 0 = return right away.",
+        ),
+    ] = 0,
 ) -> str:
     """Launch an application inside the running isolated session.
 
     Requires an active session. Returns the app PID (for use with read_app_log)
-    and the log file path.
+    and the log file path, plus the focus result when focus_timeout_ms is set.
     """
-    return _engine.launch_app(command=command, env=env)
+    return await _in_thread(
+        _engine.launch_app, command=command, env=env, focus_timeout_ms=focus_timeout_ms
+    )
 
 
 @mcp.tool()
@@ -705,7 +855,7 @@ def focus_window(
 
 
 @mcp.tool()
-def dbus_call(
+async def dbus_call(
     service: Annotated[str, Field(description='D-Bus service name (e.g. "org.kde.KWin").')],
     path: Annotated[str, Field(description='Object path (e.g. "/org/kde/KWin").')],
     interface: Annotated[str, Field(description='Interface name (e.g. "org.kde.KWin.Scripting").')],
@@ -723,8 +873,8 @@ def dbus_call(
     Executes a D-Bus method call and returns the reply. Arguments must use
     dbus-send type notation (e.g. "string:value", "int32:42", "boolean:true").
     """
-    return _engine.dbus_call(
-        service=service, path=path, interface=interface, method=method, args=args
+    return await _in_thread(
+        _engine.dbus_call, service=service, path=path, interface=interface, method=method, args=args
     )
 
 
@@ -748,7 +898,7 @@ def read_app_log(
 
 
 @mcp.tool()
-def wayland_info(
+async def wayland_info(
     filter_protocol: Annotated[
         str,
         Field(
@@ -763,7 +913,7 @@ def wayland_info(
     verifying that restricted protocols are accessible. Returns the full
     output or only lines matching the filter.
     """
-    return _engine.wayland_info(filter_protocol=filter_protocol)
+    return await _in_thread(_engine.wayland_info, filter_protocol=filter_protocol)
 
 
 def main() -> None:
@@ -9,6 +9,7 @@ from __future__ import annotations
 
 import contextlib
 import os
+import selectors
 import shutil
 import signal
 import subprocess
@@ -16,6 +17,7 @@ import tempfile
 import time
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import IO
 
 
 @dataclass
@@ -71,6 +73,7 @@ class Session:
         self._app_counter: int = 0
         self._config: SessionConfig | None = None
         self._home_dir: Path | None = None
+        self._launch_env: dict[str, str] | None = None  # built on first launch_app
 
     @property
     def is_running(self) -> bool:
@@ -163,10 +166,10 @@ class Session:
         # Wait for kwin to be ready (socket file appears)
         socket_path = Path(runtime_dir) / self._socket_name
         if not self._wait_for_socket(socket_path, timeout=10.0):
+            # Read before stop(), which drops the process handle. Other session
+            # processes may still hold the pipe open, so the read is bounded.
+            stderr = _read_pipe(self._process.stderr, timeout=2.0)
             self.stop()
-            stderr = ""
-            if self._process and self._process.stderr:
-                stderr = self._process.stderr.read().decode(errors="replace")
             msg = f"KWin failed to start. stderr: {stderr}"
             raise RuntimeError(msg)
 
@@ -198,18 +201,11 @@ class Session:
             msg = "Session is not running"
             raise RuntimeError(msg)
 
-        env = {
-            **os.environ,
-            "WAYLAND_DISPLAY": self._socket_name,
-            "QT_QPA_PLATFORM": "wayland",
-            "QT_LINUX_ACCESSIBILITY_ALWAYS_ON": "1",
-            "QT_ACCESSIBILITY": "1",
-        }
-        env.update(self._xdg_isolation_env())
+        env = self._app_env()
         if extra_env:
-            env.update(extra_env)
-        if self._info.dbus_address:
-            env["DBUS_SESSION_BUS_ADDRESS"] = self._info.dbus_address
+            env = {**env, **extra_env}
+            if self._info.dbus_address:
+                env["DBUS_SESSION_BUS_ADDRESS"] = self._info.dbus_address
 
         # Create log file for stdout/stderr capture
         app_name = Path(command[0]).stem if command else "unknown"
@@ -259,10 +255,10 @@ class Session:
         if not app.log_path.exists():
             return "(no log output yet)"
 
-        text = app.log_path.read_text(errors="replace")
         if last_n_lines > 0:
-            lines = text.splitlines()
-            text = "\n".join(lines[-last_n_lines:])
+            text = _read_last_lines(app.log_path, last_n_lines)
+        else:
+            text = app.log_path.read_text(errors="replace")
         return text or "(no log output yet)"
 
     def stop(self) -> None:
@@ -318,6 +314,7 @@ class Session:
         self._process = None
         self._info = None
         self._home_dir = None
+        self._launch_env = None
 
     def _build_wrapper_script(self, config: SessionConfig) -> str:
         """Build the bash script that runs inside dbus-run-session."""
@@ -358,8 +355,12 @@ env -u WAYLAND_DISPLAY -u QT_QPA_PLATFORM \
     --socket {self._socket_name} &
 KWIN_PID=$!
 
-# Wait for KWin socket to appear
-while [ ! -e "$XDG_RUNTIME_DIR/{self._socket_name}" ]; do sleep 0.1; done
+# Wait for KWin socket to appear (short ticks: a stat per tick is nothing next to
+# the startup time saved); give up if KWin exits before creating it
+while [ ! -e "$XDG_RUNTIME_DIR/{self._socket_name}" ] && kill -0 $KWIN_PID 2>/dev/null; do
+    sleep 0.02
+done
+[ -e "$XDG_RUNTIME_DIR/{self._socket_name}" ] || exit 1
 sleep 0.3
 
 # Signal parent that setup is complete
@@ -369,6 +370,25 @@ echo "READY"
 wait $KWIN_PID
 """
 
+    def _app_env(self) -> dict[str, str]:
+        """Return the environment for launched apps, built once per session.
+
+        The returned dict is shared between launches and must not be mutated.
+        """
+        if self._launch_env is None:
+            env = {
+                **os.environ,
+                "WAYLAND_DISPLAY": self._socket_name,
+                "QT_QPA_PLATFORM": "wayland",
+                "QT_LINUX_ACCESSIBILITY_ALWAYS_ON": "1",
+                "QT_ACCESSIBILITY": "1",
+            }
+            env.update(self._xdg_isolation_env())
+            if self._info is not None and self._info.dbus_address:
+                env["DBUS_SESSION_BUS_ADDRESS"] = self._info.dbus_address
+            self._launch_env = env
+        return self._launch_env
+
     def _build_env(self, config: SessionConfig) -> dict[str, str]:
         """Build the environment for the isolated session."""
         env = {
@@ -415,3 +435,52 @@ wait $KWIN_PID
 
     def __exit__(self, *_: object) -> None:
         self.stop()
+
+
+def _read_pipe(pipe: IO[bytes] | None, timeout: float) -> str:
+    """Read a pipe until EOF or until timeout seconds have passed, without blocking."""
+    if pipe is None:
+        return ""
+    fd = pipe.fileno()
+    os.set_blocking(fd, False)
+    chunks: list[bytes] = []
+    deadline = time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while (remaining := deadline - time.monotonic()) > 0:
+            if not selector.select(remaining):
+                break
+            try:
+                chunk = os.read(fd, 65536)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b"".join(chunks).decode(errors="replace")
+
+
+# Block size for reading log files backwards from the end.
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def _read_last_lines(path: Path, n: int) -> str:
+    """Return the last n lines of a file, reading only as much of its end as needed.
+
+    Blocks are read backwards until more than n newlines are buffered, so the
+    first (possibly partial) line is never among the returned ones and the cost
+    follows n instead of the size of a long-running app's log.
+    """
+    with path.open("rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        blocks: list[bytes] = []
+        newlines = 0
+        while pos > 0 and newlines <= n:
+            size = min(_TAIL_BLOCK_SIZE, pos)
+            pos -= size
+            f.seek(pos)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+    tail = b"".join(reversed(blocks)).decode(errors="replace")
+    return "\n".join(tail.splitlines()[-n:])